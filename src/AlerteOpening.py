@@ -1,176 +1,171 @@
 # -*- coding: utf-8 -*-
 import os
-import json
 from pathlib import Path
 import pandas as pd
-from datetime import datetime, timedelta
-from Scrap_Sportaza import scrape_sportaza
-from Scrap_Betify import scrape_betify
-from Scrap_Greenluck import scrape_greenluck
-from Scrap_Pinnacle import scrape_pinnacle
-from Scrap_MyStake import scrape_mystake
-import requests
-import inspect
+from Bookmaker_registry import plugins, call_scraper, concat_frames, empty_frame, COLUMNS
+from Telegram_queue import TelegramQueue
+from Odds_history import append_snapshot, compact_previous_days
+from Seen_store import SeenStore
+from Odds_analytics import compute_analytics, competition_trj
+from Odds_delta import OddsDiffer
+import Metrics
+import time
+import queue
+import threading
 
 
 # --- CONFIGURATION --- #
 TOKEN = os.environ.get("TELEGRAM_TOKEN")
 CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
 BASE_DIR = Path(__file__).resolve().parent
-DATA_FILE = BASE_DIR.parent / "data.json"
+DATA_FILE = BASE_DIR.parent / "data.json"   # ancien format, migré une fois dans DB_FILE
+DB_FILE = BASE_DIR.parent / "data.db"
 
-# Sports par défaut par bookmaker
-SPORTS_SPORTAZA  = ["1596","1359","1373","1393","1387", "904", "923", "924", "1405", "1406", "1415","2245", "1356", "1659", "893","2239"]
-SPORTS_BETIFY    = ["17","43","44","45","46","48"]
-SPORTS_GREENLUCK = ["14","15","16","17","27","28","31"]
-SPORTS_PINNACLE  = ["40","41", "42","43","44", "45"]
-SPORTS_MYSTAKE  = ["16","77"] 
+# Bookmakers surveillés : plugins du registre (Scrap_*.py), qui déclarent
+# leurs sports, leur transport (Tor) et leur deadline
+PLUGINS = plugins()
+
+# ⏱️ DEADLINES : temps max (secondes) accordé à chaque bookmaker. Passé ce délai,
+# le scraper rend ce qu'il a déjà collecté.
+DEADLINES = {plugin.name: plugin.deadline for plugin in PLUGINS}
+# Marge accordée après la deadline avant d'abandonner un scraper bloqué
+DEADLINE_GRACE = 15
 
 # 🗑️ DURÉE DE RÉTENTION : Compétitions plus vieilles que X jours seront supprimées
 RETENTION_DAYS = 7  # Garde 7 jours d'historique
 
-# --- HELPERS --- #
-def load_data():
-    """Charge le fichier JSON avec gestion des timestamps"""
-    if DATA_FILE.exists():
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            # Rétrocompatibilité : si ancien format (liste simple), on le convertit
-            if isinstance(data.get("competitions"), list) and data["competitions"]:
-                if isinstance(data["competitions"][0], str):
-                    # Ancien format : ["Bookmaker | Competition", ...]
-                    # On le convertit avec timestamp actuel
-                    now = datetime.now().isoformat()
-                    data["competitions"] = {
-                        comp: now for comp in data["competitions"]
-                    }
-            return data
-    return {"competitions": {}}
-
-def save_data(data):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-
-def clean_old_competitions(competitions_dict, retention_days):
-    """Supprime les compétitions plus anciennes que retention_days"""
-    cutoff_date = datetime.now() - timedelta(days=retention_days)
-    cleaned = {
-        comp: timestamp 
-        for comp, timestamp in competitions_dict.items()
-        if datetime.fromisoformat(timestamp) > cutoff_date
-    }
-    removed_count = len(competitions_dict) - len(cleaned)
-    if removed_count > 0:
-        print(f"🗑️ Nettoyage : {removed_count} compétition(s) de plus de {retention_days} jours supprimée(s)")
-    return cleaned
+# 📈 MOUVEMENTS DE COTES : variation relative minimale signalée (5 %)
+ODDS_MOVE_THRESHOLD = 0.05
+ODDS_MOVE_MAX_LINES = 20   # lignes max par message Telegram
 
+# 📮 Envoi Telegram en tâche de fond (regroupement, rate limit, outbox dans DB_FILE)
+OUTBOX = TelegramQueue(TOKEN, CHAT_ID, DB_FILE)
+OUTBOX_FLUSH_TIMEOUT = 60   # secondes laissées en fin de run pour vider la file
+
+# --- HELPERS --- #
 def send_telegram_message(msg):
-    """Envoie un message sur Telegram"""
+    """Ajoute un message à la file d'envoi Telegram (non bloquant)"""
     if not TOKEN or not CHAT_ID:
         print("⚠️ TELEGRAM_TOKEN ou CHAT_ID non défini !")
         return
-    url = f"https://api.telegram.org/bot{TOKEN}/sendMessage"
-    try:
-        response = requests.post(url, data={"chat_id": CHAT_ID, "text": msg}, timeout=30)        
-        print(f"✅ Message Telegram envoyé : {response.status_code}")
-    except Exception as e:
-        print(f"⚠️ Erreur Telegram : {e}")
+    OUTBOX.send(msg)
 
 
-def safe_scrape(scrape_func, sports, use_tor=False):
+def safe_scrape(scrape_func, sports, use_tor=False, deadline=None, window=None):
     try:
-        signature = inspect.signature(scrape_func)
-        
-        if 'use_tor' in signature.parameters:
-            df = scrape_func(Id_sport=sports, use_tor=use_tor)
-        else:
-            print(f"ℹ️ {scrape_func.__name__} ne supporte pas encore Tor, appel direct.")
-            df = scrape_func(Id_sport=sports)
-
-        required_cols = ["Bookmaker", "Competition", "Extraction", "Cutoff", "Evenement", "Competiteur", "Cote"]
+        df = call_scraper(scrape_func, sports, use_tor, deadline, window)
 
         if df is None or not isinstance(df, pd.DataFrame):
             print(f"⚠️ {scrape_func.__name__} a renvoyé None ou pas un DataFrame")
-            return pd.DataFrame(columns=required_cols)
+            return empty_frame()
         
         if df.empty:
             print(f"ℹ️ {scrape_func.__name__} n'a trouvé aucune donnée")
-            return pd.DataFrame(columns=required_cols)
+            return empty_frame()
 
-        for col in required_cols:
+        for col in COLUMNS:
             if col not in df.columns:
                 df[col] = None
         
         print(f"✅ {scrape_func.__name__} : {len(df)} lignes trouvées")
-        return df[required_cols]
+        return df[COLUMNS]
 
     except Exception as e:
         print(f"⚠️ Erreur lors du scrape {scrape_func.__name__} : {e}")
-        return pd.DataFrame(columns=["Bookmaker", "Competition", "Extraction", "Cutoff", "Evenement", "Competiteur", "Cote"])
-    
-    
-    
-# --- MAIN --- #
-def main():
-    print("🚀 Début du script d'alerte...")
+        return empty_frame()
+
+
+def scrape_all(jobs):
+    """
+    Lance tous les scrapers en parallèle (un thread par bookmaker).
+
+    jobs : liste de tuples (nom, scrape_func, sports, use_tor)
+    Chaque bookmaker reçoit sa propre deadline (DEADLINES) et rend ce qu'il a
+    collecté quand elle expire. Les résultats sont fusionnés au fil de l'eau.
+
+    Un scraper encore bloqué DEADLINE_GRACE secondes après sa deadline est
+    abandonné : ses threads sont des daemons, la fin du script ne les attend pas.
+    Les pools internes des scrapers (non daemon) restent bornés par les timeouts
+    de Http_client : aucune requête n'est émise sans timeout.
+    """
+    start = time.monotonic()
+    frames = []
+    results = queue.Queue()
+
+    def worker(name, scrape_func, sports, use_tor, deadline):
+        results.put((name, safe_scrape(scrape_func, sports, use_tor, deadline)))
+
+    pending = set()
+    for name, scrape_func, sports, use_tor in jobs:
+        deadline = start + DEADLINES.get(name, 60)
+        threading.Thread(target=worker, args=(name, scrape_func, sports, use_tor, deadline),
+                         name=f"scrape-{name}", daemon=True).start()
+        pending.add(name)
+
+    max_wait = start + max((DEADLINES.get(name, 60) for name, *_ in jobs), default=0) + DEADLINE_GRACE
+    while pending:
+        try:
+            name, df = results.get(timeout=max(0, max_wait - time.monotonic()))
+        except queue.Empty:
+            print(f"⚠️ Deadline dépassée, abandon de : {', '.join(sorted(pending))}")
+            break
+        pending.discard(name)
+        frames.append(df)
+        print(f"⏱️ {name} : {time.monotonic() - start:.1f}s ({len(df)} lignes)")
+
+    print(f"⏱️ Scraping total : {time.monotonic() - start:.1f}s")
+
+    with Metrics.stage("merge"):
+        return concat_frames(frames)
     
-    # 1️⃣ Charger et nettoyer l'historique
-    old_data = load_data()
-    old_comp_dict = old_data.get("competitions", {})
     
-    # Nettoyage des anciennes compétitions
-    old_comp_dict = clean_old_competitions(old_comp_dict, RETENTION_DAYS)
     
-    old_comp = set(old_comp_dict.keys())
-    print(f"📂 Compétitions en base ({len(old_comp)})")
+# Jobs (nom, scrape_func, sports, use_tor) tirés du registre
+BOOKMAKERS = [plugin.job() for plugin in PLUGINS]
 
-    # 2️⃣ Scraper tous les bookmakers
-    print("🔍 Scraping en cours...")
-    df_betify    = safe_scrape(scrape_betify,    SPORTS_BETIFY, use_tor=True)
-    df_sportaza  = safe_scrape(scrape_sportaza,  SPORTS_SPORTAZA)
-    df_greenluck = safe_scrape(scrape_greenluck, SPORTS_GREENLUCK)
-    df_pinnacle  = safe_scrape(scrape_pinnacle,  SPORTS_PINNACLE, use_tor=False)
-    df_mystake  = safe_scrape(scrape_mystake,  SPORTS_MYSTAKE, use_tor=False)
-
-    # 3️⃣ Fusionner tous les résultats
-    df_all = pd.concat([df_sportaza, df_betify, df_greenluck, df_pinnacle, df_mystake], ignore_index=True)
-    print(f"📊 Total de lignes scrapées : {len(df_all)}")
 
-    # 4️⃣ Créer un SET unique de "Bookmaker | Competition"
+def record_history(df_all, compact=True):
+    """Historique des cotes (Parquet partitionné jour / bookmaker)"""
+    try:
+        append_snapshot(df_all)
+        if compact:
+            compact_previous_days()
+    except Exception as e:
+        print(f"⚠️ Erreur historique des cotes : {e}")
+
+
+def alert_new_competitions(df_all, store):
+    """
+    Détecte les compétitions absentes de la base, envoie une alerte Telegram
+    pour chacune puis les enregistre. Renvoie l'ensemble des nouvelles clés.
+    """
+    # Créer un SET unique de "Bookmaker | Competition"
     if df_all.empty:
         current_comp = set()
     else:
-        current_comp = set(
-            f"{row['Bookmaker']} | {row['Competition']}" 
-            for _, row in df_all.iterrows()
-        )
+        current_comp = set(df_all["Bookmaker"].astype(str) + " | " + df_all["Competition"].astype(str))
     
     print(f"🎯 Compétitions actuelles ({len(current_comp)})")
 
-    # 5️⃣ Identifier les nouvelles compétitions
-    new_comp = current_comp - old_comp
+    # Identifier les nouvelles compétitions
+    new_comp = store.filter_new(current_comp)
     print(f"🆕 Nouvelles compétitions ({len(new_comp)}) : {new_comp}")
 
-    # 6️⃣ Envoyer les alertes
+    # Envoyer les alertes
     if new_comp:
+        # TRJ calculés une seule fois pour tout df_all (Odds_analytics)
+        df_analytics = compute_analytics(df_all)
+        trj_by_comp = competition_trj(df_analytics)
+
         for comp_key in new_comp:
             try:
                 bookmaker, competition = comp_key.split(" | ", 1)
-                df_comp = df_all[(df_all["Bookmaker"] == bookmaker) & (df_all["Competition"] == competition)].copy()
+                df_comp = df_all[(df_all["Bookmaker"] == bookmaker) & (df_all["Competition"] == competition)]
                 
                 # Calculs statistiques
                 nb_cotes = len(df_comp)
-                trj_list = []
-                df_comp["Cote"] = pd.to_numeric(df_comp["Cote"], errors='coerce')
-                
-                for event, group in df_comp.groupby("Evenement"):
-                    if len(group) == 2:
-                        cotes = group["Cote"].values
-                        if not pd.isna(cotes).any() and all(c >= 1.0 for c in cotes):
-                            trj = (1 / ((1/cotes[0]) + (1/cotes[1]))) * 100
-                            trj_list.append(trj)
-                
-                avg_trj_display = f"{sum(trj_list) / len(trj_list):.2f}%" if trj_list else "Non disponible"
+                avg_trj = trj_by_comp.get((bookmaker, competition))
+                avg_trj_display = f"{avg_trj:.2f}%" if avg_trj is not None and pd.notna(avg_trj) else "Non disponible"
                 
                 # Cutoff
                 cutoff_list = df_comp["Cutoff"].dropna().unique()
@@ -201,14 +196,72 @@ def main():
     else:
         print("ℹ️ Aucune nouvelle compétition détectée.")
 
-    # 7️⃣ Mise à jour du dictionnaire avec timestamps
-    now = datetime.now().isoformat()
-    for comp in new_comp:
-        old_comp_dict[comp] = now
+    # Enregistrement des nouvelles compétitions
+    store.add(new_comp)
+    print(f"💾 {len(new_comp)} compétition(s) ajoutée(s), {store.count()} en base")
+    return new_comp
+
+
+def alert_odds_moves(df_all, differ):
+    """
+    Compare df_all au snapshot précédent (Odds_delta) et envoie un message
+    par bookmaker listant les cotes qui ont bougé d'au moins ODDS_MOVE_THRESHOLD.
+    """
+    with Metrics.stage("diff"):
+        deltas = differ.diff(df_all)
+    moves = deltas[deltas["Type"] == "changed"]
+    print(f"📈 Mouvements de cotes : {len(moves)} modifiée(s), "
+          f"{(deltas['Type'] == 'added').sum()} ajoutée(s), {(deltas['Type'] == 'removed').sum()} retirée(s)")
+
+    for bookmaker, group in moves.groupby("Bookmaker", sort=False):
+        group = group.reindex(group["Variation"].abs().sort_values(ascending=False).index)
+        lines = [
+            f"• {row.Competition} | {row.Evenement} | {row.Competiteur} : "
+            f"{row.Cote_old:.2f} → {row.Cote_new:.2f} ({row.Variation:+.1%})"
+            for row in group.head(ODDS_MOVE_MAX_LINES).itertuples()
+        ]
+        if len(group) > ODDS_MOVE_MAX_LINES:
+            lines.append(f"… et {len(group) - ODDS_MOVE_MAX_LINES} autre(s)")
+        send_telegram_message(f"📈 Mouvements de cotes chez {bookmaker} ({len(group)})\n" + "\n".join(lines))
+    return deltas
+
+
+# --- MAIN --- #
+def main():
+    print("🚀 Début du script d'alerte...")
     
-    save_data({"competitions": old_comp_dict})
-    print(f"💾 Sauvegarde de {len(old_comp_dict)} compétitions dans data.json")
+    # 1️⃣ Ouvrir la base (migration data.json au premier lancement) et nettoyer
+    store = SeenStore(DB_FILE, legacy_json=DATA_FILE)
+    store.purge(RETENTION_DAYS)
+    print(f"📂 Compétitions en base ({store.count()})")
+
+    # Messages restés dans l'outbox au run précédent : renvoyés pendant le scraping
+    if TOKEN and CHAT_ID:
+        OUTBOX.start()
+
+    # 2️⃣ Scraper tous les bookmakers
+    print("🔍 Scraping en cours...")
+    # 3️⃣ Fusionner tous les résultats (au fur et à mesure de leur arrivée)
+    df_all = scrape_all(BOOKMAKERS)
+    print(f"📊 Total de lignes scrapées : {len(df_all)}")
+
+    with Metrics.stage("history"):
+        record_history(df_all)
+
+    # 4️⃣ → 7️⃣ Détecter, alerter et enregistrer les nouvelles compétitions
+    with Metrics.stage("alert"):
+        alert_new_competitions(df_all, store)
+
+    # 8️⃣ Mouvements de cotes depuis le run précédent
+    try:
+        alert_odds_moves(df_all, OddsDiffer(ODDS_MOVE_THRESHOLD))
+    except Exception as e:
+        print(f"⚠️ Erreur détection des mouvements de cotes : {e}")
+
+    OUTBOX.close(OUTBOX_FLUSH_TIMEOUT)
+    store.close()
+    Metrics.export()
     print("✅ Script terminé.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Mode résident d'AlerteOpening : un seul processus qui garde sessions HTTP,
+circuit Tor et caches chauds, et interroge chaque bookmaker à son propre rythme.
+
+Intervalle adaptatif par bookmaker :
+- contenu modifié depuis le dernier passage → retour à l'intervalle minimum
+- contenu identique → intervalle multiplié par BACKOFF (plafonné au maximum)
+
+Chaque snapshot est traité dès son arrivée (historique + alertes), sans attendre
+les autres bookmakers : la latence ouverture → alerte passe à quelques secondes.
+
+    python src/Alerte_daemon.py [--max-runtime SECONDES]
+"""
+import argparse
+import queue
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from AlerteOpening import (
+    BOOKMAKERS, DEADLINES, DB_FILE, DATA_FILE, RETENTION_DAYS, ODDS_MOVE_THRESHOLD,
+    TOKEN, CHAT_ID, OUTBOX, OUTBOX_FLUSH_TIMEOUT,
+    safe_scrape, record_history, alert_new_competitions, alert_odds_moves,
+)
+from Odds_delta import OddsDiffer
+from Odds_history import compact_day, compact_previous_days
+from Seen_store import SeenStore
+from Tor_pool import get_pool
+import Metrics
+
+# ⏱️ Intervalles de polling (secondes) : (minimum, maximum)
+INTERVALS = {
+    "Betify":    (30, 300),   # Tor : plus lent, on l'interroge moins souvent
+    "Sportaza":  (15, 180),
+    "Greenluck": (15, 180),
+    "Pinnacle":  (15, 180),
+    "MyStake":   (20, 240),
+}
+DEFAULT_INTERVAL = (20, 240)
+BACKOFF = 1.5           # facteur appliqué quand le contenu n'a pas changé
+
+# Tâches de maintenance (secondes)
+MAINTENANCE_EVERY = 3600   # purge de la base + compaction de l'historique (jour courant compris) + santé des circuits Tor
+IDLE_SLEEP = 1.0           # pause max de la boucle quand rien n'est dû
+
+FINGERPRINT_COLS = ["Competition", "Evenement", "Competiteur", "Cote"]
+
+
+def fingerprint(df):
+    """Empreinte du contenu d'un snapshot (indépendante de l'ordre des lignes et de l'heure d'extraction)"""
+    if df is None or df.empty:
+        return 0
+    hashes = pd.util.hash_pandas_object(df[FINGERPRINT_COLS].astype(str), index=False)
+    return int(hashes.sum()) ^ len(df)
+
+
+class BookmakerSchedule:
+    """État de polling d'un bookmaker : intervalle courant, prochaine échéance, dernière empreinte"""
+
+    def __init__(self, name, scrape_func, sports, use_tor):
+        self.name = name
+        self.scrape_func = scrape_func
+        self.sports = sports
+        self.use_tor = use_tor
+        self.min_interval, self.max_interval = INTERVALS.get(name, DEFAULT_INTERVAL)
+        self.interval = self.min_interval
+        self.next_run = time.monotonic()
+        self.last_fingerprint = None
+        self.running = False
+
+    def due(self, now):
+        return not self.running and now >= self.next_run
+
+    def update(self, df, started):
+        """Ajuste l'intervalle selon que le contenu a changé ou non ; renvoie True si changé"""
+        current = fingerprint(df)
+        changed = current != self.last_fingerprint
+        self.last_fingerprint = current
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * BACKOFF, self.max_interval)
+        # L'échéance part du début du scrape : un scrape lent ne décale pas le rythme
+        self.next_run = max(started + self.interval, time.monotonic())
+        return changed
+
+
+def run_daemon(max_runtime=None):
+    """Boucle principale ; s'arrête sur SIGINT / SIGTERM ou après max_runtime secondes"""
+    print("🚀 Démarrage du mode résident...")
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    started_at = time.monotonic()
+    schedules = [BookmakerSchedule(*job) for job in BOOKMAKERS]
+    # La base SQLite n'est utilisée que depuis ce thread ; les scrapers tournent chacun
+    # dans un thread daemon : un scraper bloqué n'empêche pas l'arrêt du processus
+    store = SeenStore(DB_FILE, legacy_json=DATA_FILE)
+    store.purge(RETENTION_DAYS)
+    print(f"📂 Compétitions en base ({store.count()})")
+
+    differ = OddsDiffer(ODDS_MOVE_THRESHOLD)
+    if TOKEN and CHAT_ID:
+        OUTBOX.start()
+
+    last_maintenance = time.monotonic()
+    results = queue.Queue()
+
+    def worker(schedule, started, deadline):
+        try:
+            df = safe_scrape(schedule.scrape_func, schedule.sports, schedule.use_tor, deadline)
+        except Exception as e:
+            print(f"⚠️ {schedule.name} : {e}")
+            df = None
+        results.put((schedule, started, df))
+
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            if max_runtime is not None and now - started_at >= max_runtime:
+                print(f"⏹️ Durée maximale atteinte ({max_runtime}s)")
+                break
+
+            # Lancer les bookmakers arrivés à échéance
+            for schedule in schedules:
+                if schedule.due(now):
+                    schedule.running = True
+                    deadline = now + DEADLINES.get(schedule.name, 60)
+                    threading.Thread(target=worker, args=(schedule, now, deadline),
+                                     name=f"scrape-{schedule.name}", daemon=True).start()
+
+            # Attendre le premier résultat ou la prochaine échéance
+            next_due = min((s.next_run for s in schedules if not s.running), default=now + IDLE_SLEEP)
+            timeout = min(max(next_due - time.monotonic(), 0), IDLE_SLEEP)
+            done = []
+            try:
+                done.append(results.get(timeout=timeout))
+                while True:
+                    done.append(results.get_nowait())
+            except queue.Empty:
+                pass
+
+            for schedule, started, df in done:
+                schedule.running = False
+                changed = schedule.update(df, started)
+                elapsed = time.monotonic() - started
+                print(f"⏱️ {datetime.now():%H:%M:%S} {schedule.name} : {elapsed:.1f}s, "
+                      f"{0 if df is None else len(df)} lignes, "
+                      f"{'modifié' if changed else 'inchangé'}, prochain passage dans {schedule.interval:.0f}s")
+
+                # Contenu vide ou identique : rien à historiser, aucune nouvelle compétition possible
+                if df is None or df.empty or not changed:
+                    continue
+                with Metrics.stage("history", schedule.name):
+                    record_history(df, compact=False)
+                try:
+                    with Metrics.stage("alert", schedule.name):
+                        alert_new_competitions(df, store)
+                    alert_odds_moves(df, differ)
+                except Exception as e:
+                    print(f"⚠️ Erreur lors du traitement de {schedule.name} : {e}")
+
+            # Métriques réécrites après chaque résultat (lues par le collector local)
+            if done:
+                Metrics.export()
+
+            # Maintenance périodique
+            if time.monotonic() - last_maintenance >= MAINTENANCE_EVERY:
+                last_maintenance = time.monotonic()
+                store.purge(RETENTION_DAYS)
+                try:
+                    # Le jour courant aussi : un fichier par snapshot modifié sinon jusqu'à minuit
+                    compact_previous_days()
+                    compact_day(datetime.now(timezone.utc).date())
+                except Exception as e:
+                    print(f"⚠️ Erreur compaction de l'historique : {e}")
+                if any(s.use_tor for s in schedules):
+                    get_pool().health_check()
+    finally:
+        # Les scrapers encore en cours sont abandonnés : threads daemon, non attendus à la sortie
+        OUTBOX.close(OUTBOX_FLUSH_TIMEOUT)
+        store.close()
+    print("✅ Mode résident arrêté.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alertes d'ouverture en mode résident")
+    parser.add_argument("--max-runtime", type=float, default=None,
+                        help="durée maximale d'exécution en secondes (défaut : illimitée)")
+    args = parser.parse_args()
+    run_daemon(args.max_runtime)
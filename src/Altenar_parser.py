@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Client et normaliseur des payloads "widget" Altenar (Sportaza, ...).
+
+Les réponses GetEvents / GetOutrightEvents sont des listes à plat
+(events, markets, odds, champs) reliées par IDs. On les fusionne en
+dédoublonnant, puis on construit les index en une seule passe.
+Un autre bookmaker hébergé par Altenar ne change que `integration`.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from Http_client import http_get
+
+ALTENAR_URL = "https://sb2frontend-altenar2.biahosted.com/api/widget"
+ENTITY_KEYS = ("events", "markets", "odds", "champs")
+
+# Nombre de catIds par requête et nombre de requêtes simultanées
+CHUNK_SIZE = 6
+MAX_WORKERS = 6
+
+
+def chunk_ids(ids, size=CHUNK_SIZE):
+    """Découpe une liste d'IDs (dédoublonnée, ordre conservé) en paquets"""
+    unique = list(dict.fromkeys(str(i) for i in ids))
+    return [unique[i:i + size] for i in range(0, len(unique), size)]
+
+
+def base_params(integration, **extra_params):
+    """Paramètres communs des appels widget"""
+    params = {
+        "culture": "fr-FR",
+        "timezoneOffset": -120,
+        "integration": integration,
+        "deviceType": 1,
+        "numFormat": "en-GB",
+        "countryCode": "LI",
+        "eventCount": 0,
+        "sportId": 0,
+    }
+    params.update(extra_params)
+    return params
+
+
+def fetch_categories(integration="sportaza", **extra_params):
+    """
+    Arbre sports / catégories (GetSportMenu) :
+    liste de {"id", "name", "sport", "count"} par catégorie (count = None si absent).
+    """
+    response = http_get(f"{ALTENAR_URL}/GetSportMenu", params=base_params(integration, **extra_params))
+    response.raise_for_status()
+    data = response.json()
+
+    sport_names = {s.get("id"): s.get("name") for s in data.get("sports", []) or []}
+    return [{
+        "id": str(cat.get("id")),
+        "name": cat.get("name"),
+        "sport": sport_names.get(cat.get("sportId")),
+        "count": cat.get("eventCount", cat.get("count")),
+    } for cat in data.get("categories", []) or []]
+
+
+def fetch_altenar(cat_ids, integration="sportaza", endpoints=("GetOutrightEvents", "GetEvents"),
+                  chunk_size=CHUNK_SIZE, max_workers=MAX_WORKERS, deadline=None, **extra_params):
+    """
+    Télécharge en parallèle chaque (endpoint, paquet de catIds) et renvoie un
+    payload fusionné {"events": {id: ...}, "markets": {...}, "odds": {...}, "champs": {...}}.
+    """
+    params_base = base_params(integration, **extra_params)
+
+    def fetch(suffix, chunk):
+        if deadline and time.monotonic() > deadline:
+            return None
+        params = dict(params_base, catIds=",".join(chunk))
+        response = http_get(f"{ALTENAR_URL}/{suffix}", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    merged = {key: {} for key in ENTITY_KEYS}
+    tasks = [(suffix, chunk) for suffix in endpoints for chunk in chunk_ids(cat_ids, chunk_size)]
+    if not tasks:
+        return merged
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+        futures = {executor.submit(fetch, suffix, chunk): (suffix, chunk) for suffix, chunk in tasks}
+        for future in as_completed(futures):
+            suffix, chunk = futures[future]
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"⚠️ Altenar {integration} {suffix} {','.join(chunk)} : {e}")
+                continue
+            if data:
+                merge_payload(merged, data)
+
+    return merged
+
+
+def merge_payload(merged, data):
+    """Ajoute une réponse brute au payload fusionné (première occurrence d'un ID conservée)"""
+    for key in ENTITY_KEYS:
+        bucket = merged[key]
+        for entity in data.get(key, []) or []:
+            bucket.setdefault(entity["id"], entity)
+    return merged
+
+
+def index_payload(merged):
+    """
+    Construit les index marketId→event, oddId→odd et champId→champ.
+
+    Une seule passe sur les events : O(events × marketIds) au lieu de
+    O(markets × events × marketIds).
+    """
+    event_by_market = {}
+    for event in merged["events"].values():
+        for market_id in event.get("marketIds", []):
+            event_by_market.setdefault(market_id, event)
+
+    return {
+        "event_by_market": event_by_market,
+        "odds": merged["odds"],
+        "champs": merged["champs"],
+        "markets": merged["markets"],
+    }
+
+
+def iter_h2h_markets(index):
+    """Renvoie (event, champ, [odd1, odd2]) pour chaque marché face-à-face"""
+    odds = index["odds"]
+    for market in index["markets"].values():
+        event = index["event_by_market"].get(market["id"])
+        if not event:
+            continue
+
+        if len(event.get("competitorIds", [])) != 2 and event.get("sc") != 2:
+            continue
+
+        odds_list = [odds[o] for o in market.get("oddIds", []) if o in odds]
+        if len(odds_list) != 2:
+            continue
+
+        yield event, index["champs"].get(event.get("champId"), {}), odds_list
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark des scrapers sur fixtures HTTP (aucun accès réseau).
+
+    # 1. Enregistrer les réponses réelles des bookmakers (fixtures/v1/<hôte>/...)
+    python src/Bench_parsers.py --record
+
+    # 2. Rejouer et mesurer : temps, lignes / s et pic mémoire par scraper
+    python src/Bench_parsers.py --repeat 3
+
+Le cache disque est vidé avant chaque passage : on mesure un parsing complet,
+pas un passage où les caches (versions Betify, compétitions MyStake...) évitent le travail.
+En rejeu, l'horloge des scrapers (TimeWindow) est figée à l'instant de l'enregistrement :
+sinon les events des fixtures finissent par être « commencés » et plus rien n'est parsé.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+# Cache disque isolé, à définir avant l'import des scrapers
+BENCH_CACHE = Path(tempfile.mkdtemp(prefix="scrap-bench-"))
+os.environ["SCRAP_CACHE_DIR"] = str(BENCH_CACHE)
+
+import Http_client
+from AlerteOpening import BOOKMAKERS, safe_scrape
+from Time_window import TimeWindow
+
+
+def clear_cache():
+    """Vide les entrées du cache en gardant les dossiers des namespaces"""
+    for path in BENCH_CACHE.rglob("*"):
+        if path.is_file():
+            path.unlink()
+
+
+def replay_window():
+    """Fenêtre dont l'horloge est l'instant d'enregistrement des fixtures"""
+    recorded_at = Http_client.fixtures_recorded_at()
+    if recorded_at is None:
+        return None
+    return TimeWindow(start=recorded_at)
+
+
+def run_once(scrape_func, sports, use_tor, trace_memory=False, window=None):
+    clear_cache()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    df = safe_scrape(scrape_func, sports, use_tor, window=window)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return len(df), elapsed, peak
+
+
+def bench(names=None, repeat=3):
+    """Mesure chaque scraper : meilleur temps sur `repeat` passages + pic mémoire (passage séparé)"""
+    window = replay_window()
+    results = []
+    for name, scrape_func, sports, use_tor in BOOKMAKERS:
+        if names and name not in names:
+            continue
+        timings = []
+        rows = 0
+        for _ in range(repeat):
+            rows, elapsed, _ = run_once(scrape_func, sports, use_tor, window=window)
+            timings.append(elapsed)
+        # tracemalloc ralentit l'exécution : pic mémoire mesuré à part
+        _, _, peak = run_once(scrape_func, sports, use_tor, trace_memory=True, window=window)
+
+        best = min(timings)
+        results.append({
+            "bookmaker": name,
+            "rows": rows,
+            "wall_s": round(best, 4),
+            "rows_per_s": round(rows / best, 1) if best > 0 else None,
+            "peak_mib": round(peak / 2 ** 20, 2),
+        })
+    return results
+
+
+def record(names=None):
+    """Scrape en direct et enregistre toutes les réponses des bookmakers"""
+    Http_client.set_mode("record")
+    for name, scrape_func, sports, use_tor in BOOKMAKERS:
+        if names and name not in names:
+            continue
+        rows, elapsed, _ = run_once(scrape_func, sports, use_tor)
+        print(f"📼 {name} : {rows} lignes enregistrées en {elapsed:.1f}s")
+
+
+def print_table(results):
+    print(f"\n{'Bookmaker':<12}{'Lignes':>10}{'Temps (s)':>12}{'Lignes/s':>12}{'Pic (MiB)':>12}")
+    for r in results:
+        print(f"{r['bookmaker']:<12}{r['rows']:>10}{r['wall_s']:>12.3f}{r['rows_per_s'] or 0:>12.0f}{r['peak_mib']:>12.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark des scrapers sur fixtures HTTP")
+    parser.add_argument("--record", action="store_true", help="enregistrer les fixtures (accès réseau)")
+    parser.add_argument("--bookmakers", nargs="*", help="limiter à ces bookmakers (ex: Betify Pinnacle)")
+    parser.add_argument("--repeat", type=int, default=3, help="nombre de passages chronométrés")
+    parser.add_argument("--fixtures", help="dossier des fixtures (défaut : fixtures/)")
+    parser.add_argument("--json", help="écrire les résultats dans ce fichier JSON")
+    args = parser.parse_args()
+
+    try:
+        if args.fixtures:
+            Http_client.set_mode(Http_client.HTTP_MODE, args.fixtures)
+        if args.record:
+            record(args.bookmakers)
+            sys.exit(0)
+
+        Http_client.set_mode("replay")
+        results = bench(args.bookmakers, args.repeat)
+        print_table(results)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        shutil.rmtree(BENCH_CACHE, ignore_errors=True)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Registre des bookmakers (plugins) et construction commune des DataFrames.
+
+Un plugin = un module Scrap_<Nom>.py dont la fonction de scraping est décorée :
+
+    @register("Pinnacle", sports=["40", "41"], deadline=45)
+    def scrape_pinnacle(Id_sport=None, deadline=None) -> pd.DataFrame:
+        batch = RowBatch("Pinnacle")
+        ...
+        batch.append(competition, evenement, competiteur, cote, cutoff)
+        return batch.to_frame()
+
+Les modules Scrap_*.py sont découverts automatiquement (discover()) :
+ajouter un bookmaker = écrire un plugin, sans toucher Run_Scrap ni AlerteOpening.
+
+Les sports demandés (IDs ou noms) sont traduits par Sport_catalogue avant
+chaque appel ; avec open_only=True (exports), les sports sans marché ouvert
+ne sont pas interrogés.
+"""
+import inspect
+import importlib
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pytz
+from pandas.api.types import union_categoricals
+
+from Time_window import as_window
+
+BASE_DIR = Path(__file__).resolve().parent
+PLUGIN_PATTERN = "Scrap_*.py"
+
+COLUMNS = ["Bookmaker", "Competition", "Extraction", "Cutoff", "Evenement", "Competiteur", "Cote"]
+CATEGORY_COLS = ["Bookmaker", "Competition", "Evenement"]
+PARIS_TZ = pytz.timezone("Europe/Paris")
+
+REGISTRY = {}
+
+
+# --- DataFrame commun --- #
+def empty_frame():
+    """DataFrame vide au format commun des scrapers"""
+    return pd.DataFrame(columns=COLUMNS)
+
+
+class RowBatch:
+    """
+    Lignes d'un scraping stockées en colonnes (une liste par colonne, aucun dict
+    par ligne) ; le DataFrame est construit une seule fois par to_frame().
+    """
+    __slots__ = ("bookmaker", "competition", "evenement", "competiteur", "cote", "cutoff")
+
+    def __init__(self, bookmaker):
+        self.bookmaker = bookmaker
+        self.competition = []
+        self.evenement = []
+        self.competiteur = []
+        self.cote = []
+        self.cutoff = []
+
+    def append(self, competition, evenement, competiteur, cote, cutoff):
+        """cutoff : datetime (avec fuseau) ou chaîne ISO 8601, None si inconnu"""
+        self.competition.append(competition)
+        self.evenement.append(evenement)
+        self.competiteur.append(competiteur)
+        self.cote.append(cote)
+        self.cutoff.append(cutoff)
+
+    def __len__(self):
+        return len(self.cote)
+
+    def to_frame(self, extraction=None):
+        """
+        DataFrame COLUMNS : Bookmaker / Competition / Evenement en catégories,
+        Cote en float, Cutoff et Extraction en datetime Europe/Paris.
+        """
+        if not self.cote:
+            return empty_frame()
+        n = len(self.cote)
+        extraction = extraction or datetime.now(PARIS_TZ)
+        df = pd.DataFrame({
+            "Bookmaker": pd.Categorical([self.bookmaker]).repeat(n),
+            "Competition": pd.Categorical(self.competition),
+            "Cutoff": pd.to_datetime(pd.Series(self.cutoff, dtype="object"), errors="coerce", utc=True)
+                        .dt.tz_convert(PARIS_TZ),
+            "Evenement": pd.Categorical(self.evenement),
+            "Competiteur": pd.Series(self.competiteur, dtype="object"),
+            "Cote": pd.to_numeric(pd.Series(self.cote, dtype="object"), errors="coerce"),
+        })
+        df["Extraction"] = pd.Timestamp(extraction)
+        return df[COLUMNS]
+
+
+def concat_frames(frames):
+    """
+    Concatène des DataFrames de scrapers en gardant les colonnes catégorielles
+    (pd.concat repasse en object dès que les catégories diffèrent).
+    """
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return empty_frame()
+    df = pd.concat(frames, ignore_index=True)
+    for col in CATEGORY_COLS:
+        if all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+            df[col] = union_categoricals([f[col] for f in frames])
+    return df
+
+
+# --- Plugins --- #
+class BookmakerPlugin:
+    __slots__ = ("name", "scrape", "sports", "export_sports", "use_tor", "deadline")
+
+    def __init__(self, name, scrape, sports, export_sports=None, use_tor=False, deadline=60):
+        """
+        sports        : IDs (ou noms) de sports surveillés par défaut (alertes)
+        export_sports : IDs (ou noms) utilisés pour les exports Excel (défaut : sports)
+        use_tor       : le transport passe par Tor
+        deadline      : temps max (secondes) accordé au scraping
+        """
+        self.name = name
+        self.scrape = scrape
+        self.sports = list(dict.fromkeys(str(s) for s in sports))
+        self.export_sports = list(dict.fromkeys(str(s) for s in export_sports or sports))
+        self.use_tor = use_tor
+        self.deadline = deadline
+
+    def job(self):
+        """Tuple (nom, scrape_func, sports, use_tor) attendu par AlerteOpening.scrape_all"""
+        return (self.name, self.scrape, self.sports, self.use_tor)
+
+    def resolve_sports(self, sports=None, open_only=False, use_tor=None):
+        """
+        IDs à interroger : noms traduits, sports sans marché ouvert écartés si open_only (Sport_catalogue).
+        use_tor : transport de la découverte du catalogue (None = transport du plugin).
+        """
+        from Sport_catalogue import resolve
+
+        try:
+            return resolve(self.name, sports or self.sports, open_only,
+                           self.use_tor if use_tor is None else use_tor)
+        except Exception as e:
+            print(f"⚠️ Catalogue {self.name} : {e}")
+            return list(sports or self.sports)
+
+    def run(self, sports=None, use_tor=None, deadline=None, window=None, open_only=False):
+        return call_scraper(self.scrape, sports or self.sports,
+                            self.use_tor if use_tor is None else use_tor, deadline, window, open_only)
+
+
+def register(name, sports, export_sports=None, use_tor=False, deadline=60):
+    """Décorateur : enregistre la fonction de scraping comme plugin `name`"""
+    def decorator(func):
+        REGISTRY[name] = BookmakerPlugin(name, func, sports, export_sports, use_tor, deadline)
+        return func
+    return decorator
+
+
+def call_scraper(scrape_func, sports, use_tor=False, deadline=None, window=None, open_only=False):
+    """
+    Appelle un scraper avec les seuls paramètres qu'il accepte (use_tor, deadline, window).
+    window    : Time_window.TimeWindow, nombre d'heures ou None (fenêtre par défaut).
+    open_only : ne pas interroger les sports sans marché ouvert (exports ; jamais
+                pour les alertes, qui doivent voir les ouvertures sans délai).
+    Pour un plugin, les sports passent d'abord par le catalogue (resolve_sports).
+    """
+    plugin = next((p for p in REGISTRY.values() if p.scrape is scrape_func), None)
+    if plugin is not None:
+        sports = plugin.resolve_sports(sports, open_only, use_tor)
+        if not sports:
+            return empty_frame()
+    parameters = inspect.signature(scrape_func).parameters
+    kwargs = {"Id_sport": sports}
+    if "use_tor" in parameters:
+        kwargs["use_tor"] = use_tor
+    if "deadline" in parameters:
+        kwargs["deadline"] = deadline
+    if "window" in parameters:
+        kwargs["window"] = as_window(window)
+    return scrape_func(**kwargs)
+
+
+def discover():
+    """Importe tous les modules Scrap_*.py (chacun enregistre son plugin)"""
+    for path in sorted(BASE_DIR.glob(PLUGIN_PATTERN)):
+        importlib.import_module(path.stem)
+    return REGISTRY
+
+
+def get_plugin(name):
+    if name not in REGISTRY:
+        discover()
+    return REGISTRY[name]
+
+
+def plugins(names=None):
+    """Plugins enregistrés (tous, ou ceux de `names` dans cet ordre)"""
+    discover()
+    if names is None:
+        return list(REGISTRY.values())
+    return [REGISTRY[name] for name in names]
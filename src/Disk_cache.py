@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Cache disque clé/valeur (JSON) partagé par les scrapers.
+
+Chaque namespace est un dossier de CACHE_DIR, chaque clé un fichier JSON :
+on ne réécrit que les entrées qui changent. TTL et nombre max d'entrées
+(éviction LRU sur la date d'accès) sont optionnels.
+"""
+import os
+import json
+import time
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = Path(os.environ.get("SCRAP_CACHE_DIR", BASE_DIR.parent / "cache"))
+
+
+class DiskCache:
+    def __init__(self, namespace, ttl=None, max_entries=None, root=None):
+        """
+        namespace   : nom du sous-dossier (ex: "betify_versions")
+        ttl         : durée de vie en secondes (None = illimitée)
+        max_entries : nombre max d'entrées, les moins récemment lues sont évincées
+        """
+        self.dir = Path(root or CACHE_DIR) / namespace
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def _path(self, key):
+        return self.dir / f"{quote(str(key), safe='')}.json"
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return default
+
+        if self.ttl is not None and time.time() - entry.get("ts", 0) > self.ttl:
+            return default
+
+        # La date de modification sert d'horodatage LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("value", default)
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ts": time.time(), "value": value}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def delete(self, key):
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def keys(self):
+        return [unquote(p.stem) for p in self.dir.glob("*.json")]
+
+    def __contains__(self, key):
+        return self._path(key).exists()
+
+    def prune(self):
+        """
+        Supprime les entrées expirées puis évince les plus anciennes au-delà de max_entries.
+        Sans lire les fichiers : une entrée ni écrite ni lue depuis ttl secondes
+        (date de modification) est forcément expirée. Une entrée expirée mais lue
+        récemment part au plus ttl secondes plus tard ; get() ne la rend jamais.
+        """
+        files = []
+        for p in self.dir.glob("*.json"):
+            try:
+                files.append((p.stat().st_mtime, p))
+            except OSError:
+                pass
+        removed = 0
+
+        if self.ttl is not None:
+            now = time.time()
+            kept = []
+            for mtime, p in files:
+                if now - mtime > self.ttl:
+                    p.unlink(missing_ok=True)
+                    removed += 1
+                else:
+                    kept.append((mtime, p))
+            files = kept
+
+        if self.max_entries is not None and len(files) > self.max_entries:
+            files.sort(key=lambda f: f[0])
+            for _, p in files[:len(files) - self.max_entries]:
+                p.unlink(missing_ok=True)
+                removed += 1
+
+        return removed
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Formats d'export d'un scraping, à côté du classeur Excel.
+
+Tous partent du même export préparé (Excel_builder.prepare_export) : mêmes
+colonnes calculées (export_frame), même ordre des compétitions, mêmes couleurs.
+
+- xlsx    : classeur Excel (une feuille par compétition)
+- parquet : colonnes typées, pour l'analyse (pandas, DuckDB, ...)
+- csv     : texte trié et stable, pour comparer deux extractions
+- html    : rapport statique, une table colorée par compétition
+
+    export(df, formats=("parquet", "html"), export_dir="Extraction")
+"""
+import html
+
+import pandas as pd
+
+from Excel_builder import (
+    NUMBER_FORMATS, ROW_FILLS, prepare_export, export_path, print_summary, write_workbook,
+)
+from Metrics import stage
+
+EXPORTERS = {}
+DEFAULT_FORMATS = ("xlsx",)
+
+
+def register_exporter(fmt, extension=None):
+    """Décorateur : enregistre writer(prepared, path) pour le format `fmt`"""
+    def decorator(func):
+        EXPORTERS[fmt] = (func, extension or fmt)
+        return func
+    return decorator
+
+
+@register_exporter("xlsx")
+def write_xlsx(prepared, path):
+    return write_workbook(prepared, path)
+
+
+@register_exporter("parquet")
+def write_parquet(prepared, path):
+    prepared.ordered().to_parquet(path, index=False)
+    return path
+
+
+@register_exporter("csv")
+def write_csv(prepared, path):
+    prepared.ordered().to_csv(path, index=False, float_format="%.6g", date_format="%Y-%m-%d %H:%M:%S%z")
+    return path
+
+
+# --- HTML --- #
+HEADER_COLOR = "4F81BD"
+
+
+def html_formatter(fmt):
+    """Équivalent texte d'un format numérique Excel (NUMBER_FORMATS)"""
+    if fmt.startswith("yyyy"):
+        return lambda v: v.strftime("%Y-%m-%d %H:%M:%S")
+    if fmt == "0.000":
+        return lambda v: f"{v:.3f}"
+    if fmt == "0.0%":
+        return lambda v: f"{v:.1%}"
+    if fmt.startswith("€"):
+        return lambda v: f"€{v:,.0f}"
+    return str
+
+
+def html_cell(value, formatter):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    try:
+        return html.escape(formatter(value))
+    except (TypeError, ValueError, AttributeError):
+        return html.escape(str(value))
+
+
+@register_exporter("html")
+def write_html(prepared, path):
+    headers = list(prepared.export_df.columns)
+    formatters = [html_formatter(NUMBER_FORMATS.get(i, "General")) for i in range(len(headers))]
+    title = f"Extraction {prepared.bookmaker_name}"
+
+    parts = [
+        "<!DOCTYPE html>",
+        f'<html lang="fr"><head><meta charset="utf-8"><title>{html.escape(title)}</title>',
+        "<style>",
+        "body{font-family:Calibri,Arial,sans-serif;font-size:13px}",
+        "table{border-collapse:collapse;margin-bottom:24px}",
+        "th,td{border:1px solid #000;padding:2px 6px;text-align:center;white-space:nowrap}",
+        f"th{{background:#{HEADER_COLOR};color:#FFF}}",
+        *(f".{color}{{background:#{rgb}}}" for color, rgb in ROW_FILLS.items()),
+        "</style></head><body>",
+        f"<h1>{html.escape(title)}</h1>",
+        "<ul>",
+    ]
+    groups = list(prepared.groups())
+    for i, (name, group, _) in enumerate(groups):
+        cutoff = prepared.summary.loc[name, "Cutoff"]
+        parts.append(f'<li><a href="#c{i}">{html.escape(str(name))}</a> '
+                     f'({len(group)} cotes, cutoff {html_cell(cutoff, formatters[1])})</li>')
+    parts.append("</ul>")
+
+    header_row = "".join(f"<th>{html.escape(str(h))}</th>" for h in headers)
+    for i, (name, group, colors) in enumerate(groups):
+        parts.append(f'<h2 id="c{i}">{html.escape(str(name))}</h2>')
+        parts.append(f"<table><thead><tr>{header_row}</tr></thead><tbody>")
+        for values, color in zip(group.itertuples(index=False), colors):
+            cells = "".join(f"<td>{html_cell(v, f)}</td>" for v, f in zip(values, formatters))
+            parts.append(f'<tr class="{color}">{cells}</tr>')
+        parts.append("</tbody></table>")
+    parts.append("</body></html>")
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+    return path
+
+
+# --- API --- #
+def export(df, formats=DEFAULT_FORMATS, bookmaker_name=None, export_dir=".", kelly_number=4, stake_number=15):
+    """
+    Prépare l'export une fois puis écrit chaque format demandé ;
+    renvoie {format: chemin du fichier}.
+    """
+    unknown = [fmt for fmt in formats if fmt not in EXPORTERS]
+    if unknown:
+        raise ValueError(f"Format(s) d'export inconnu(s) : {', '.join(unknown)} (disponibles : {', '.join(EXPORTERS)})")
+
+    prepared = prepare_export(df, bookmaker_name, kelly_number, stake_number)
+    print_summary(prepared.summary)
+
+    paths = {}
+    for fmt in formats:
+        writer, extension = EXPORTERS[fmt]
+        with stage(f"export_{fmt}", prepared.bookmaker_name):
+            paths[fmt] = writer(prepared, export_path(export_dir, prepared.bookmaker_name, extension))
+    return paths
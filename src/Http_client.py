@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Couche HTTP commune à tous les scrapers.
+
+- une requests.Session par hôte (keep-alive, pool de connexions)
+- timeouts par défaut / par hôte (plus aucune requête sans timeout)
+- retry avec backoff exponentiel + jitter sur 429 / 5xx / erreurs réseau
+- négociation gzip (et brotli si le module est installé)
+- proxy (Tor) déclaré par hôte dans HOST_CONFIG, plus dans les scrapers ;
+  les requêtes Tor sont réparties sur un pool de circuits isolés (Tor_pool)
+- enregistrement / rejeu des réponses des bookmakers (SCRAP_HTTP_MODE) :
+  "record" écrit chaque réponse dans fixtures/<version>/<hôte>/<hash>.json.gz,
+  "replay" les relit sans aucun accès réseau
+- GET conditionnel (ETag / Last-Modified) avec cache disque du résultat parsé
+"""
+import os
+import gzip
+import json
+import time
+import base64
+import hashlib
+import random
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+import Metrics
+from Tor_pool import get_pool, on_renew
+
+try:
+    import brotli  # noqa: F401  (urllib3 décode "br" si le module est présent)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+# --- CONFIGURATION --- #
+DEFAULT_TIMEOUT = (5, 20)     # (connexion, lecture) en secondes
+POOL_SIZE = 16                # connexions gardées ouvertes par hôte
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5            # secondes, doublé à chaque tentative
+BACKOFF_MAX = 10
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+# Réglages par hôte : headers, tor, proxies, timeout, retries, compress
+HOST_CONFIG = {
+    # Betify (sptpub) : passe par Tor par défaut
+    "api-a-c7818b61-600.sptpub.com": {
+        "tor": True,
+        "timeout": (10, 30),
+        "headers": {
+            "Accept": "application/json, text/plain, */*",
+            "Referer": "https://www.betify.com/",
+        },
+    },
+    # Pinnacle (arcadia)
+    "guest.api.arcadia.pinnacle.com": {
+        "headers": {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                          "AppleWebKit/537.36 (KHTML, like Gecko) "
+                          "Chrome/129.0 Safari/537.36",
+            "Accept": "application/json, text/plain, */*",
+            "Origin": "https://www.pinnacle.com",
+            "Referer": "https://www.pinnacle.com/",
+        },
+    },
+    # Sportaza (Altenar)
+    "sb2frontend-altenar2.biahosted.com": {},
+    # Greenluck (CDN, revalidé par conditional_get)
+    "pre-161o-sp.sbx.bet": {"timeout": (5, 15)},
+    # MyStake
+    "analytics-sp.googleserv.tech": {"timeout": (5, 10)},
+}
+
+# Enregistrement / rejeu : "live" (défaut), "record" ou "replay".
+# Tous les hôtes sont concernés sauf ceux de LIVE_HOSTS (Telegram) : en rejeu, un
+# hôte sans fixture lève ConnectionError, aucune requête ne part sur le réseau.
+HTTP_MODE = os.environ.get("SCRAP_HTTP_MODE", "live")
+LIVE_HOSTS = {"api.telegram.org"}
+FIXTURE_VERSION = "v1"   # à incrémenter quand le format des fixtures change
+FIXTURES_DIR = Path(os.environ.get("SCRAP_FIXTURES_DIR", Path(__file__).resolve().parent.parent / "fixtures"))
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def configure_host(host, **settings):
+    """Ajoute / modifie les réglages d'un hôte (tor, proxies, headers, timeout, ...)"""
+    HOST_CONFIG.setdefault(host, {}).update(settings)
+    with _lock:
+        _sessions.pop(host, None)
+
+
+def get_session(host):
+    """Renvoie la Session (pool de connexions) dédiée à l'hôte, créée au premier appel"""
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            config = HOST_CONFIG.get(host, {})
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT})
+            if config.get("compress", True):
+                session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            session.headers.update(config.get("headers", {}))
+            _sessions[host] = session
+    return session
+
+
+def release_proxy(url):
+    """
+    Ferme et oublie les pools SOCKS d'une URL de proxy dans toutes les Sessions.
+    requests garde un gestionnaire par URL de proxy sans jamais l'évincer : chaque
+    circuit Tor renouvelé (nouveaux identifiants) en laisserait un ouvert.
+    """
+    with _lock:
+        sessions = list(_sessions.values())
+    for session in sessions:
+        for adapter in set(session.adapters.values()):
+            manager = adapter.proxy_manager.pop(url, None)
+            if manager is not None:
+                manager.clear()
+
+
+on_renew(release_proxy)
+
+
+def _proxies_for(config, use_tor):
+    """(proxies, circuit Tor ou None) pour une tentative"""
+    if use_tor is None:
+        use_tor = config.get("tor", False)
+    if use_tor:
+        circuit = get_pool().acquire()
+        return circuit.proxies, circuit
+    return config.get("proxies"), None
+
+
+def _backoff(attempt, response=None):
+    """Délai avant la prochaine tentative : Retry-After si fourni, sinon exponentiel + jitter"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), BACKOFF_MAX)
+    delay = min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.5)
+
+
+# --- ENREGISTREMENT / REJEU --- #
+def set_mode(mode, fixtures_dir=None):
+    """Change le mode HTTP ("live", "record", "replay") et éventuellement le dossier des fixtures"""
+    global HTTP_MODE, FIXTURES_DIR
+    if mode not in ("live", "record", "replay"):
+        raise ValueError(f"Mode HTTP inconnu : {mode}")
+    HTTP_MODE = mode
+    if fixtures_dir is not None:
+        FIXTURES_DIR = Path(fixtures_dir)
+
+
+def fixture_path(method, url, params=None, data=None, json_body=None):
+    """Fichier de fixture d'une requête : hash de (méthode, url, paramètres, corps)"""
+    canonical = json.dumps(
+        [method.upper(), url, sorted((params or {}).items()), data, json_body],
+        sort_keys=True, default=str,
+    )
+    digest = hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:20]
+    return FIXTURES_DIR / FIXTURE_VERSION / urlsplit(url).hostname / f"{digest}.json.gz"
+
+
+def _record(path, method, url, params, response):
+    """Écrit la réponse (corps décompressé) dans sa fixture"""
+    body = response.content
+    try:
+        entry_body, encoding = body.decode("utf-8"), "text"
+    except UnicodeDecodeError:
+        entry_body, encoding = base64.b64encode(body).decode("ascii"), "base64"
+    entry = {
+        "method": method.upper(),
+        "url": url,
+        "params": params,
+        "status": response.status_code,
+        "headers": {"Content-Type": response.headers.get("Content-Type", "")},
+        "encoding": response.encoding,
+        "body_encoding": encoding,
+        "body": entry_body,
+        "recorded_at": time.time(),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+def fixtures_recorded_at(fixtures_dir=None):
+    """Instant (epoch) du début de l'enregistrement des fixtures ; None s'il n'y en a pas"""
+    root = Path(fixtures_dir or FIXTURES_DIR) / FIXTURE_VERSION
+    recorded = []
+    for path in root.glob("*/*.json.gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            recorded_at = json.load(f).get("recorded_at")
+        if recorded_at is not None:
+            recorded.append(recorded_at)
+    return min(recorded) if recorded else None
+
+
+def _replay(path, url):
+    """Reconstruit une Response depuis sa fixture ; ConnectionError si elle n'existe pas"""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        raise requests.ConnectionError(f"Fixture absente pour {url} ({path})")
+
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response.headers = CaseInsensitiveDict(entry.get("headers", {}))
+    response.url = entry.get("url", url)
+    response.encoding = entry.get("encoding")
+    if entry.get("body_encoding") == "base64":
+        response._content = base64.b64decode(entry["body"])
+    else:
+        response._content = entry["body"].encode("utf-8")
+    response._content_consumed = True   # iter_content relit _content (pas de flux réseau)
+    return response
+
+
+def request(method, url, params=None, headers=None, timeout=None, use_tor=None, retries=None, **kwargs):
+    """
+    Requête HTTP via la Session de l'hôte.
+
+    use_tor : None = réglage de l'hôte, True/False pour forcer
+    Renvoie la dernière Response obtenue (même en 429/5xx après épuisement des
+    retries) ; lève l'exception réseau si aucune réponse n'a pu être obtenue.
+    """
+    host = urlsplit(url).hostname
+    config = HOST_CONFIG.get(host, {})
+
+    fixture = None
+    if HTTP_MODE != "live" and host not in LIVE_HOSTS:
+        fixture = fixture_path(method, url, params, kwargs.get("data"), kwargs.get("json"))
+        if HTTP_MODE == "replay":
+            return _replay(fixture, url)
+
+    session = get_session(host)
+
+    timeout = timeout or config.get("timeout", DEFAULT_TIMEOUT)
+    retries = config.get("retries", MAX_RETRIES) if retries is None else retries
+    for attempt in range(retries + 1):
+        # Tor : un circuit par tentative (un retry repart sur un autre circuit)
+        proxies, circuit = _proxies_for(config, use_tor)
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, params=params, headers=headers,
+                                       timeout=timeout, proxies=proxies, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            Metrics.record_request(host, type(e).__name__, time.perf_counter() - start)
+            if circuit is not None:
+                get_pool().release(circuit, time.perf_counter() - start, ok=False)
+            if attempt >= retries:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+        # Réponse en flux (stream=True) : taille annoncée, le corps n'est pas lu ici
+        nbytes = int(response.headers.get("Content-Length") or 0) if kwargs.get("stream") else len(response.content)
+        Metrics.record_request(host, response.status_code, time.perf_counter() - start, nbytes)
+        if circuit is not None:
+            get_pool().release(circuit, time.perf_counter() - start, status=response.status_code)
+
+        if response.status_code in RETRY_STATUS and attempt < retries:
+            # Rend la connexion au pool (stream=True : le corps n'a pas été lu)
+            response.close()
+            time.sleep(_backoff(attempt, response))
+            continue
+        if fixture is not None:
+            _record(fixture, method, url, params, response)
+        return response
+
+
+def http_get(url, params=None, **kwargs):
+    return request("GET", url, params=params, **kwargs)
+
+
+def http_post(url, data=None, json=None, **kwargs):
+    return request("POST", url, data=data, json=json, **kwargs)
+
+
+def conditional_get(url, cache, parse, params=None, headers=None, **kwargs):
+    """
+    GET revalidé avec cache disque (DiskCache) du résultat de parse(response).
+
+    - If-None-Match / If-Modified-Since envoyés si l'entrée en cache a des validateurs
+    - 304, ou 200 au corps identique (empreinte SHA-1) : parse() n'est pas rappelé
+    Renvoie (valeur, modifié) ; lève requests.HTTPError si le statut n'est pas exploitable.
+    """
+    key = f"{url}?{urlencode(sorted(params.items()))}" if params else url
+    entry = cache.get(key)
+    headers = dict(headers or {})
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = http_get(url, params=params, headers=headers, **kwargs)
+    if response.status_code == 304 and entry:
+        return entry["value"], False
+    if response.status_code != 200:
+        raise requests.HTTPError(f"{response.status_code} pour {url}", response=response)
+
+    digest = hashlib.sha1(response.content).hexdigest()
+    if entry and entry.get("digest") == digest:
+        value, changed = entry["value"], False
+    else:
+        value, changed = parse(response), True
+    validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    # Entrée réécrite seulement si le contenu ou ses validateurs ont changé
+    if changed or any(entry.get(k) != v for k, v in validators.items()):
+        cache.set(key, {**validators, "digest": digest, "value": value})
+    return value, changed
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentation du scraping : requêtes HTTP par hôte et durée des étapes.
+
+- requêtes : nombre, octets, codes de statut, histogramme de latence par hôte
+  (enregistré par Http_client à chaque tentative)
+- étapes : durées par (étape, bookmaker) via stage() / timed()
+  (scrape, parse, merge, history, alert, diff, excel...)
+
+Export en fin de run :
+- metrics/metrics.json : lisible par programme
+- metrics/scrap.prom   : format texte Prometheus (node_exporter textfile collector)
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+METRICS_DIR = Path(os.environ.get("SCRAP_METRICS_DIR", BASE_DIR.parent / "metrics"))
+
+# Bornes (secondes) de l'histogramme de latence HTTP
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_hosts = {}
+_stages = {}
+
+
+def _host_entry(host):
+    entry = _hosts.get(host)
+    if entry is None:
+        entry = _hosts[host] = {
+            "requests": 0,
+            "bytes": 0,
+            "status": {},
+            "latency_sum": 0.0,
+            "latency_buckets": [0] * len(LATENCY_BUCKETS),
+        }
+    return entry
+
+
+def record_request(host, status, latency, nbytes=0):
+    """Une tentative HTTP ; status = code HTTP ou nom de l'erreur réseau"""
+    with _lock:
+        entry = _host_entry(host or "unknown")
+        entry["requests"] += 1
+        entry["bytes"] += nbytes
+        entry["status"][str(status)] = entry["status"].get(str(status), 0) + 1
+        entry["latency_sum"] += latency
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                entry["latency_buckets"][i] += 1
+
+
+def observe_stage(name, seconds, bookmaker=""):
+    """Ajoute une durée à l'étape (name, bookmaker)"""
+    with _lock:
+        entry = _stages.setdefault((name, bookmaker or ""), {"count": 0, "sum": 0.0, "max": 0.0, "last": 0.0})
+        entry["count"] += 1
+        entry["sum"] += seconds
+        entry["max"] = max(entry["max"], seconds)
+        entry["last"] = seconds
+
+
+@contextmanager
+def stage(name, bookmaker=""):
+    """with stage("parse", "Betify"): ... → durée ajoutée même en cas d'exception"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start, bookmaker)
+
+
+def timed(name, bookmaker=""):
+    """Décorateur : chronomètre chaque appel de la fonction comme l'étape `name`"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name, bookmaker):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def merge(data):
+    """Ajoute un snapshot() pris ailleurs (processus de construction des exports)"""
+    with _lock:
+        for host, e in data.get("hosts", {}).items():
+            entry = _host_entry(host)
+            entry["requests"] += e["requests"]
+            entry["bytes"] += e["bytes"]
+            for status, count in e["status"].items():
+                entry["status"][status] = entry["status"].get(status, 0) + count
+            entry["latency_sum"] += e["latency_sum"]
+            entry["latency_buckets"] = [a + b for a, b in zip(entry["latency_buckets"], e["latency_buckets"])]
+        for s in data.get("stages", []):
+            entry = _stages.setdefault((s["stage"], s["bookmaker"]), {"count": 0, "sum": 0.0, "max": 0.0, "last": 0.0})
+            entry["count"] += s["count"]
+            entry["sum"] += s["sum"]
+            entry["max"] = max(entry["max"], s["max"])
+            entry["last"] = s["last"]
+
+
+def reset():
+    with _lock:
+        _hosts.clear()
+        _stages.clear()
+
+
+def snapshot():
+    """Copie de toutes les métriques (dict sérialisable JSON)"""
+    with _lock:
+        return {
+            "generated_at": time.time(),
+            "latency_buckets": list(LATENCY_BUCKETS),
+            "hosts": {host: {**e, "status": dict(e["status"]), "latency_buckets": list(e["latency_buckets"])}
+                      for host, e in _hosts.items()},
+            "stages": [{"stage": name, "bookmaker": bookmaker, **e} for (name, bookmaker), e in _stages.items()],
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus(data=None):
+    """Métriques au format texte Prometheus"""
+    data = data or snapshot()
+    lines = [
+        "# HELP scrap_http_requests_total Requêtes HTTP par hôte et statut.",
+        "# TYPE scrap_http_requests_total counter",
+    ]
+    for host, e in data["hosts"].items():
+        for status, count in e["status"].items():
+            lines.append(f'scrap_http_requests_total{{host="{_escape(host)}",status="{_escape(status)}"}} {count}')
+
+    lines += [
+        "# HELP scrap_http_response_bytes_total Octets reçus par hôte.",
+        "# TYPE scrap_http_response_bytes_total counter",
+    ]
+    for host, e in data["hosts"].items():
+        lines.append(f'scrap_http_response_bytes_total{{host="{_escape(host)}"}} {e["bytes"]}')
+
+    lines += [
+        "# HELP scrap_http_latency_seconds Latence des requêtes HTTP par hôte.",
+        "# TYPE scrap_http_latency_seconds histogram",
+    ]
+    for host, e in data["hosts"].items():
+        label = f'host="{_escape(host)}"'
+        for bound, count in zip(data["latency_buckets"], e["latency_buckets"]):
+            lines.append(f'scrap_http_latency_seconds_bucket{{{label},le="{bound}"}} {count}')
+        lines.append(f'scrap_http_latency_seconds_bucket{{{label},le="+Inf"}} {e["requests"]}')
+        lines.append(f'scrap_http_latency_seconds_sum{{{label}}} {e["latency_sum"]:.6f}')
+        lines.append(f'scrap_http_latency_seconds_count{{{label}}} {e["requests"]}')
+
+    lines += [
+        "# HELP scrap_stage_seconds Durée des étapes (scrape, parse, merge, diff, alert, excel...).",
+        "# TYPE scrap_stage_seconds summary",
+    ]
+    for s in data["stages"]:
+        label = f'stage="{_escape(s["stage"])}",bookmaker="{_escape(s["bookmaker"])}"'
+        lines.append(f'scrap_stage_seconds_sum{{{label}}} {s["sum"]:.6f}')
+        lines.append(f'scrap_stage_seconds_count{{{label}}} {s["count"]}')
+    lines += [
+        "# HELP scrap_stage_last_seconds Durée du dernier passage de chaque étape.",
+        "# TYPE scrap_stage_last_seconds gauge",
+    ]
+    for s in data["stages"]:
+        label = f'stage="{_escape(s["stage"])}",bookmaker="{_escape(s["bookmaker"])}"'
+        lines.append(f'scrap_stage_last_seconds{{{label}}} {s["last"]:.6f}')
+
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    """Écriture atomique (le collector ne doit jamais lire un fichier à moitié écrit)"""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def export(metrics_dir=None):
+    """Écrit metrics.json et scrap.prom ; renvoie les deux chemins"""
+    root = Path(metrics_dir or METRICS_DIR)
+    root.mkdir(parents=True, exist_ok=True)
+    data = snapshot()
+    json_path, prom_path = root / "metrics.json", root / "scrap.prom"
+    _write_atomic(json_path, json.dumps(data, indent=2, ensure_ascii=False))
+    _write_atomic(prom_path, to_prometheus(data))
+    return json_path, prom_path
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Rapprochement des face-à-face d'un soft book avec leur équivalent Pinnacle
+(cote de référence Cote_PS3838).
+
+- normalisation commune des noms (accents, ponctuation, casse)
+- index de blocage par trigrammes sur les participants Pinnacle : chaque
+  événement du soft book n'est comparé qu'aux K événements Pinnacle qui
+  partagent le plus de trigrammes, jamais à tous (pas de produit cartésien)
+- les trigrammes trop fréquents ("fc ", " de"...) sont écartés de l'index :
+  leurs listes d'événements reviendraient à tout comparer
+- filtre sur la fenêtre de cutoff, puis score flou sur la paire de noms
+  (dans les deux sens : A/B ou B/A)
+"""
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+REF_COL = "Cote_PS3838"
+CUTOFF_WINDOW = np.timedelta64(6, "h")   # écart max entre les cutoffs des deux books
+MIN_SCORE = 0.75                     # score moyen minimum de la paire de noms
+TOP_K = 20                           # candidats Pinnacle examinés par événement
+MIN_DICE = 0.3                       # recouvrement de trigrammes minimum pour scorer un candidat
+STOP_GRAM_RATIO = 0.02               # trigramme présent dans plus de 2 % des événements : ignoré
+STOP_GRAM_MIN = 50                   # ... et dans plus de 50 événements (petits index intacts)
+FALLBACK_GRAMS = 3                   # noms sans trigramme rare : les 3 moins fréquents
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(name):
+    """'Tadej Pogačar (SLO)' → 'tadej pogacar slo'"""
+    if not name or not isinstance(name, str):
+        return ""
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM.sub(" ", ascii_name.lower()).strip()
+
+
+def trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@lru_cache(maxsize=65536)
+def name_score(a, b):
+    """
+    Similarité de deux noms normalisés (0 → 1) : ratio sur les tokens triés,
+    et 0.9 si même nom de famille avec initiale compatible ('pogacar t').
+    """
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    ta, tb = a.split(), b.split()
+    score = SequenceMatcher(None, " ".join(sorted(ta)), " ".join(sorted(tb))).ratio()
+
+    long_a = {t for t in ta if len(t) > 2}
+    long_b = {t for t in tb if len(t) > 2}
+    if long_a & long_b:
+        initials_a = {t[0] for t in ta}
+        initials_b = {t[0] for t in tb}
+        if (long_a <= long_b or long_b <= long_a) and (initials_a <= initials_b or initials_b <= initials_a):
+            score = max(score, 0.9)
+    return score
+
+
+class ReferenceIndex:
+    """Index de blocage (trigramme → événements Pinnacle) sur les face-à-face de référence"""
+
+    def __init__(self, df_ref):
+        self.events = []
+        self.postings = defaultdict(list)
+        self.stop_postings = {}
+
+        if df_ref is None or df_ref.empty:
+            return
+
+        names = [normalize_name(n) for n in df_ref["Competiteur"]]
+        prices = pd.to_numeric(df_ref["Cote"], errors="coerce").to_numpy()
+        cutoffs = pd.to_datetime(df_ref["Cutoff"], errors="coerce", utc=True).dt.tz_convert(None).to_numpy()
+
+        for rows in df_ref.groupby(["Competition", "Evenement"], sort=False, dropna=False, observed=True).indices.values():
+            if len(rows) != 2:
+                continue
+            i, j = rows
+            event_id = len(self.events)
+            grams = trigrams(names[i]) | trigrams(names[j])
+            self.events.append({
+                "names": (names[i], names[j]),
+                "grams": grams,
+                "prices": [prices[i], prices[j]],
+                "cutoff": cutoffs[i],
+            })
+            for gram in grams:
+                self.postings[gram].append(event_id)
+
+        # Trigrammes fréquents retirés de l'index ; le Dice ne porte que sur les trigrammes rares
+        max_df = max(STOP_GRAM_MIN, STOP_GRAM_RATIO * len(self.events))
+        self.stop_postings = {g: ids for g, ids in self.postings.items() if len(ids) > max_df}
+        for gram in self.stop_postings:
+            del self.postings[gram]
+        stop = self.stop_postings.keys()
+        for event in self.events:
+            event["n_grams"] = len(event.pop("grams") - stop) or 1
+
+    def candidates(self, names, k=TOP_K):
+        """
+        Les k événements partageant le plus de trigrammes avec les deux noms,
+        avec leur coefficient de Dice (les moins proches sont écartés).
+        """
+        all_grams = trigrams(names[0]) | trigrams(names[1])
+        grams = [g for g in all_grams if g in self.postings]
+        postings = self.postings
+        if not grams:
+            # Noms faits uniquement de trigrammes fréquents : on bloque sur les moins fréquents
+            grams = sorted((g for g in all_grams if g in self.stop_postings),
+                           key=lambda g: len(self.stop_postings[g]))[:FALLBACK_GRAMS]
+            postings = self.stop_postings
+        n_grams = len(grams) or 1
+
+        counts = Counter()
+        for gram in grams:
+            counts.update(postings.get(gram, ()))
+
+        result = []
+        for event_id, shared in counts.most_common(k):
+            dice = 2 * shared / (n_grams + self.events[event_id]["n_grams"])
+            if dice >= MIN_DICE:
+                result.append(event_id)
+        return result
+
+    def match(self, names, cutoff=np.datetime64("NaT"), cutoff_window=CUTOFF_WINDOW, min_score=MIN_SCORE):
+        """
+        Renvoie (cotes de référence alignées sur `names`, score) ou (None, 0).
+        """
+        best, best_score = None, min_score
+        for event_id in self.candidates(names):
+            event = self.events[event_id]
+            if not np.isnat(cutoff) and not np.isnat(event["cutoff"]):
+                if abs(event["cutoff"] - cutoff) > cutoff_window:
+                    continue
+
+            p1, p2 = event["names"]
+            straight = (name_score(names[0], p1) + name_score(names[1], p2)) / 2
+            swapped = (name_score(names[0], p2) + name_score(names[1], p1)) / 2
+            if straight >= swapped and straight >= best_score:
+                best, best_score = event["prices"], straight
+            elif swapped > straight and swapped >= best_score:
+                best, best_score = event["prices"][::-1], swapped
+
+            # Noms identiques : inutile d'examiner les candidats suivants
+            if best_score >= 1.0:
+                break
+
+        return best, (best_score if best is not None else 0.0)
+
+
+def fill_reference_odds(df, df_ref, ref_col=REF_COL, cutoff_window=CUTOFF_WINDOW, min_score=MIN_SCORE):
+    """
+    Remplit ref_col (Cote_PS3838) pour chaque face-à-face de df retrouvé chez Pinnacle.
+    Les lignes sans correspondance gardent une valeur vide.
+    """
+    out = df.copy()
+    out[ref_col] = pd.Series(float("nan"), index=out.index)
+    if out.empty or df_ref is None or df_ref.empty:
+        return out
+
+    index = ReferenceIndex(df_ref)
+    names = [normalize_name(n) for n in out["Competiteur"]]
+    cutoffs = pd.to_datetime(out["Cutoff"], errors="coerce", utc=True).dt.tz_convert(None).to_numpy()
+    ref_prices = np.full(len(out), np.nan)
+    matched = 0
+
+    group_cols = [c for c in ["Bookmaker", "Competition", "Evenement"] if c in out.columns]
+    for rows in out.groupby(group_cols, sort=False, dropna=False, observed=True).indices.values():
+        if len(rows) != 2:
+            continue
+        i, j = rows
+        prices, _ = index.match((names[i], names[j]), cutoffs[i], cutoff_window, min_score)
+        if prices is not None:
+            ref_prices[[i, j]] = prices
+            matched += 1
+
+    out[ref_col] = ref_prices
+    print(f"🔗 {matched} face-à-face rapprochés de Pinnacle ({len(index.events)} en référence)")
+    return out
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Calculs de cotes vectorisés (NumPy / pandas), partagés par l'export Excel
+et les alertes Telegram.
+
+Mêmes définitions que les anciennes formules Excel de build_excel :
+- TrueOdds_MPTO : cote "juste" de la référence (méthode MPTO, marge retirée
+  proportionnellement à la cote)
+- ImpliedProb / TrueProb_MPTO : 1/cote référence et 1/TrueOdds
+- TRJ        : TRJ croisé (cote book de la ligne, cote référence de l'adversaire)
+- %_boost    : Cote / TrueOdds - 1
+- Kelly      : fraction de Kelly divisée par kelly_number
+- Stake      : Kelly × stake_number × 100, Potential_Payout = Cote × Stake
+- Surebet    : "YES" si TRJ > 1
+- TRJ_Book / TRJ_PS3838 : TRJ du face-à-face chez le book / chez la référence
+
+Un événement = (Bookmaker, Competition, Evenement) ; les TRJ ne sont définis que pour
+les face-à-face (exactement 2 lignes).
+"""
+import numpy as np
+import pandas as pd
+
+REF_COL = "Cote_PS3838"
+GROUP_COLS = ["Bookmaker", "Competition", "Evenement"]
+
+ANALYTICS_COLS = [
+    "TrueOdds_MPTO", "ImpliedProb", "TrueProb_MPTO", "TRJ", "%_boost",
+    "Kelly", "Stake", "Potential_Payout", "Surebet", "TRJ_Book", "TRJ_PS3838",
+]
+
+
+def _inverse(values):
+    """1/x, NaN pour les cotes absentes ou nulles"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv = 1.0 / values
+    inv[~np.isfinite(inv)] = np.nan
+    return inv
+
+
+def compute_analytics(df, kelly_number=4, stake_number=15, odds_col="Cote", ref_col=REF_COL, group_cols=GROUP_COLS):
+    """
+    Renvoie une copie de df avec toutes les colonnes de ANALYTICS_COLS,
+    calculées en une passe (groupby transform, aucune boucle par ligne).
+    """
+    out = df.copy()
+    if out.empty:
+        for col in ANALYTICS_COLS:
+            out[col] = pd.Series(dtype="object" if col == "Surebet" else "float64")
+        return out
+
+    cote = pd.to_numeric(out[odds_col], errors="coerce").to_numpy(dtype="float64")
+    if ref_col in out.columns:
+        ref = pd.to_numeric(out[ref_col], errors="coerce").to_numpy(dtype="float64")
+    else:
+        ref = np.full(len(out), np.nan)
+
+    # Clé d'événement (NaN remplacés pour ne perdre aucune ligne dans le groupby)
+    keys = [out[c].astype("object").where(out[c].notna(), "") for c in group_cols if c in out.columns]
+    grouper = pd.DataFrame({f"k{i}": k.to_numpy() for i, k in enumerate(keys)}, index=out.index)
+    by = list(grouper.columns)
+
+    inv_cote = _inverse(cote)
+    inv_ref = _inverse(ref)
+
+    frame = pd.DataFrame({"inv_cote": inv_cote, "inv_ref": inv_ref}, index=out.index)
+    frame = pd.concat([grouper, frame], axis=1)
+    groups = frame.groupby(by, sort=False)
+
+    n = groups["inv_cote"].transform("size").to_numpy(dtype="float64")
+    sum_inv_ref = groups["inv_ref"].transform("sum").to_numpy()
+    # Sommes "complètes" : NaN dès qu'une cote du groupe manque
+    sum_inv_cote = np.where(groups["inv_cote"].transform("count").to_numpy() == n,
+                            groups["inv_cote"].transform("sum").to_numpy(), np.nan)
+    sum_inv_ref_all = np.where(groups["inv_ref"].transform("count").to_numpy() == n, sum_inv_ref, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # MPTO : n·G / (n − (Σ1/G − 1)·G)
+        true_odds = np.where(np.isnan(ref), np.nan, n * ref / (n - (sum_inv_ref - 1) * ref))
+        true_prob = _inverse(true_odds)
+        boost = cote / true_odds - 1
+
+        kelly = ((cote - 1) * true_prob - (1 - true_prob)) / (cote - 1) / kelly_number
+        kelly[~np.isfinite(kelly)] = np.nan
+        stake = kelly * stake_number * 100
+        payout = cote * stake
+
+        # Face-à-face : l'adversaire est "le reste" du groupe de 2 lignes
+        h2h = n == 2
+        trj = np.where(h2h, 1.0 / (inv_cote + (sum_inv_ref_all - inv_ref)), np.nan)
+        trj_book = np.where(h2h, 1.0 / sum_inv_cote, np.nan)
+        trj_ref = np.where(h2h, 1.0 / sum_inv_ref_all, np.nan)
+
+    surebet = np.where(np.isnan(trj), None, np.where(trj > 1, "YES", "NO"))
+
+    out["TrueOdds_MPTO"] = true_odds
+    out["ImpliedProb"] = inv_ref
+    out["TrueProb_MPTO"] = true_prob
+    out["TRJ"] = trj
+    out["%_boost"] = boost
+    out["Kelly"] = kelly
+    out["Stake"] = stake
+    out["Potential_Payout"] = payout
+    out["Surebet"] = surebet
+    out["TRJ_Book"] = trj_book
+    out["TRJ_PS3838"] = trj_ref
+    return out
+
+
+def export_frame(df, bookmaker_name, kelly_number=4, stake_number=15):
+    """
+    DataFrame prêt à exporter : colonnes et en-têtes de l'onglet Excel
+    (Cutoff_<Bookmaker>, Kelly_<k>, Stake_<n>, ...), valeurs précalculées.
+    """
+    cutoff_col = f"Cutoff_{bookmaker_name}" if f"Cutoff_{bookmaker_name}" in df.columns else "Cutoff"
+    competiteur_col = f"Competiteur_{bookmaker_name}" if f"Competiteur_{bookmaker_name}" in df.columns else "Competiteur"
+    cote_col = f"Cote_{bookmaker_name}" if f"Cote_{bookmaker_name}" in df.columns else "Cote"
+
+    data = compute_analytics(df, kelly_number, stake_number, odds_col=cote_col)
+    if REF_COL not in data.columns:
+        data[REF_COL] = np.nan
+
+    return pd.DataFrame({
+        "Extraction": data["Extraction"],
+        f"Cutoff_{bookmaker_name}": data[cutoff_col],
+        "Competition": data["Competition"],
+        "Evenement": data["Evenement"],
+        f"Competiteur_{bookmaker_name}": data[competiteur_col],
+        f"Cote_{bookmaker_name}": pd.to_numeric(data[cote_col], errors="coerce"),
+        REF_COL: pd.to_numeric(data[REF_COL], errors="coerce"),
+        "TrueOdds_MPTO": data["TrueOdds_MPTO"],
+        "ImpliedProb": data["ImpliedProb"],
+        "TrueProb_MPTO": data["TrueProb_MPTO"],
+        "TRJ": data["TRJ"],
+        "%_boost": data["%_boost"],
+        f"Kelly_{kelly_number}": data["Kelly"],
+        f"Stake_{stake_number}": data["Stake"],
+        "Potential_Payout": data["Potential_Payout"],
+        "Surebet": data["Surebet"],
+        "TRJ_Book": data["TRJ_Book"],
+        "TRJ_PS3838": data["TRJ_PS3838"],
+    }, index=data.index)
+
+
+def competition_trj(df):
+    """
+    TRJ moyen (en %) par (Bookmaker, Competition), sur les face-à-face dont
+    les deux cotes sont valides (≥ 1.0). df doit sortir de compute_analytics.
+    """
+    cote = pd.to_numeric(df["Cote"], errors="coerce")
+    event_cols = [c for c in GROUP_COLS if c in df.columns]
+    valid = cote.groupby([df[c] for c in event_cols], sort=False, observed=True, dropna=False).transform("min") >= 1.0
+    return df.loc[valid].groupby(["Bookmaker", "Competition"], sort=False, observed=True)["TRJ_Book"].mean() * 100
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Détection des mouvements de cotes entre deux snapshots d'un même bookmaker.
+
+L'état précédent est gardé par bookmaker, en deux parties :
+    index   : empreinte d'événement → digest de ses cotes (une entrée de cache)
+    entrées : empreinte d'événement → [Competition, Evenement, {Competiteur: cote}]
+              (une entrée de cache par événement, lue seulement si besoin)
+
+- les empreintes (événement et digest des cotes) sont calculées en une passe
+  vectorisée (hash pandas), sans merge entre les deux snapshots
+- les événements modifiés, ajoutés ou disparus sont trouvés en comparant les
+  digests à l'index d'un bloc ; seuls ceux-là sont parcourus ligne à ligne
+- seules leurs entrées sont réécrites (ou supprimées) sur disque
+- une cote n'est remplacée dans l'état que si son mouvement est signalé
+  (variation ≥ threshold) : les petites dérives successives finissent par compter
+"""
+import numpy as np
+import pandas as pd
+
+from Disk_cache import DiskCache
+
+DELTA_COLS = ["Bookmaker", "Competition", "Evenement", "Competiteur", "Type", "Cote_old", "Cote_new", "Variation"]
+EVENT_COLS = ["Bookmaker", "Competition", "Evenement"]
+
+# Variation relative minimale (|new / old − 1|) pour signaler un changement de cote
+DEFAULT_THRESHOLD = 0.0
+
+
+def _hash(frame):
+    return pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy()
+
+
+class BookmakerState:
+    """Index des digests d'un bookmaker et entrées d'événements déjà chargées"""
+    __slots__ = ("digests", "entries", "dirty", "deleted")
+
+    def __init__(self, digests):
+        self.digests = digests     # {empreinte: digest}
+        self.entries = {}          # {empreinte: [Competition, Evenement, {Competiteur: cote}]}
+        self.dirty = set()         # entrées à réécrire au prochain persist
+        self.deleted = set()       # entrées à supprimer au prochain persist
+
+
+class OddsDiffer:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, cache=None):
+        """
+        threshold : variation relative minimale d'une cote pour être signalée
+        cache     : DiskCache où persister l'état (None = DiskCache("odds_delta")),
+                    False pour un état uniquement en mémoire
+        """
+        self.threshold = threshold
+        self.cache = DiskCache("odds_delta") if cache is None else cache
+        self.states = {}
+
+    def _state(self, bookmaker):
+        if bookmaker not in self.states:
+            stored = self.cache.get(bookmaker) if self.cache else None
+            state = None
+            if stored is not None:
+                state = BookmakerState({k: v for k, v in stored.items() if not isinstance(v, list)})
+                # Ancien format (état complet dans une seule entrée) : migré au prochain persist
+                for key, value in stored.items():
+                    if isinstance(value, list):
+                        state.digests[key] = value[0]
+                        state.entries[key] = value[1:]
+                        state.dirty.add(key)
+            self.states[bookmaker] = state
+        return self.states[bookmaker]
+
+    def _entry(self, bookmaker, state, key):
+        if key not in state.entries:
+            entry = self.cache.get(f"{bookmaker}|{key}") if self.cache else None
+            state.entries[key] = entry or ["", "", {}]
+        return state.entries[key]
+
+    def has_state(self, bookmaker):
+        """True si un snapshot précédent existe pour ce bookmaker"""
+        return self._state(bookmaker) is not None
+
+    def diff(self, df, persist=True):
+        """
+        Compare df au snapshot précédent de chacun de ses bookmakers et met l'état à jour.
+        Renvoie un DataFrame DELTA_COLS (Type : added / removed / changed).
+        Les bookmakers absents de df ne sont pas touchés.
+        """
+        if df is None or df.empty:
+            return pd.DataFrame(columns=DELTA_COLS)
+
+        frame = df[EVENT_COLS + ["Competiteur", "Cote"]].reset_index(drop=True)
+        event_hash = _hash(frame[EVENT_COLS])
+        cote = pd.to_numeric(frame["Cote"], errors="coerce").to_numpy(dtype="float64")
+
+        # Digest d'un événement = somme (modulo 2^64) des hash (Competiteur, Cote) de ses lignes
+        row_hash = _hash(pd.DataFrame({"c": frame["Competiteur"], "p": cote}))
+        digest = pd.Series(row_hash).groupby(event_hash, sort=False).transform("sum").to_numpy()
+
+        deltas = []
+        bookmakers = frame["Bookmaker"].astype(str).to_numpy()
+        competitions = frame["Competition"].to_numpy()
+        evenements = frame["Evenement"].to_numpy()
+        competiteurs = frame["Competiteur"].to_numpy()
+
+        for bookmaker, rows in pd.Series(range(len(frame))).groupby(bookmakers, sort=False).indices.items():
+            state = self._state(bookmaker)
+            if state is None:
+                state = self.states[bookmaker] = BookmakerState({})
+
+            # Une ligne par événement : digests comparés à l'index en un bloc
+            firsts = rows[~pd.Series(event_hash[rows]).duplicated().to_numpy()]
+            keys = event_hash[firsts].astype(str)
+            digests = digest[firsts].astype(str)
+            previous = pd.Series(state.digests, dtype=object)
+            changed = previous.reindex(keys).to_numpy() != digests
+            gone = previous.index.difference(keys)
+
+            changed_rows = rows[np.isin(event_hash[rows], event_hash[firsts[changed]])]
+            for positions in pd.Series(changed_rows).groupby(event_hash[changed_rows], sort=False).indices.values():
+                positions = changed_rows[positions]
+                first = positions[0]
+                key = str(event_hash[first])
+                old_prices = dict(self._entry(bookmaker, state, key)[2]) if key in state.digests else {}
+
+                prices = {}
+                for i in positions:
+                    name = competiteurs[i]
+                    new = cote[i]
+                    if name not in old_prices:
+                        prices[name] = new
+                        deltas.append((bookmaker, competitions[first], evenements[first], name, "added", np.nan, new))
+                        continue
+                    before = old_prices.pop(name)
+                    if self._moved(before, new):
+                        prices[name] = new
+                        deltas.append((bookmaker, competitions[first], evenements[first], name, "changed", before, new))
+                    else:
+                        prices[name] = before   # on garde la cote de référence
+                for name, before in old_prices.items():
+                    deltas.append((bookmaker, competitions[first], evenements[first], name, "removed", before, np.nan))
+
+                state.digests[key] = str(digest[first])
+                state.entries[key] = [competitions[first], evenements[first],
+                                      {k: (None if pd.isna(v) else float(v)) for k, v in prices.items()}]
+                state.dirty.add(key)
+                state.deleted.discard(key)
+
+            # Événements disparus du snapshot
+            for key in gone:
+                competition, evenement, old_prices = self._entry(bookmaker, state, key)
+                for name, before in old_prices.items():
+                    deltas.append((bookmaker, competition, evenement, name, "removed", before, np.nan))
+                del state.digests[key]
+                state.entries.pop(key, None)
+                state.dirty.discard(key)
+                state.deleted.add(key)
+
+            if persist and self.cache:
+                self._persist(bookmaker, state)
+
+        result = pd.DataFrame(deltas, columns=DELTA_COLS[:-1])
+        result["Cote_old"] = pd.to_numeric(result["Cote_old"], errors="coerce")
+        result["Cote_new"] = pd.to_numeric(result["Cote_new"], errors="coerce")
+        result["Variation"] = result["Cote_new"] / result["Cote_old"] - 1
+        return result
+
+    def _persist(self, bookmaker, state):
+        """Réécrit les entrées modifiées, supprime les disparues, puis l'index s'il a changé"""
+        if not (state.dirty or state.deleted) and bookmaker in self.cache:
+            return
+        for key in state.dirty:
+            self.cache.set(f"{bookmaker}|{key}", state.entries[key])
+        for key in state.deleted:
+            self.cache.delete(f"{bookmaker}|{key}")
+        self.cache.set(bookmaker, state.digests)
+        state.dirty.clear()
+        state.deleted.clear()
+
+    def _moved(self, before, new):
+        if before is None or pd.isna(before):
+            return not pd.isna(new)
+        if pd.isna(new):
+            return True
+        if before == new:
+            return False
+        return before == 0 or abs(new / before - 1) >= self.threshold
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Historique des cotes : chaque snapshot de scraping est ajouté (append-only)
+dans un dataset Parquet partitionné par jour et par bookmaker :
+
+    history/date=YYYY-MM-DD/bookmaker=<Bookmaker>/part-<HHMMSS>-<id>.parquet
+
+Colonnes texte en dictionnaire (catégorielles), cotes en float32.
+Les lectures filtrent par période / bookmaker sans tout charger en mémoire.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # dépendance optionnelle
+    pa = None
+
+BASE_DIR = Path(__file__).resolve().parent
+HISTORY_DIR = Path(os.environ.get("SCRAP_HISTORY_DIR", BASE_DIR.parent / "history"))
+
+TEXT_COLS = ["Competition", "Evenement", "Competiteur"]
+
+
+def _schema():
+    text = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("Extraction", pa.timestamp("ms", tz="UTC")),
+        ("Cutoff", pa.timestamp("ms", tz="UTC")),
+        ("Competition", text),
+        ("Evenement", text),
+        ("Competiteur", text),
+        ("Cote", pa.float32()),
+    ])
+
+
+def _partitioning():
+    return ds.partitioning(
+        pa.schema([("date", pa.string()), ("bookmaker", pa.string())]),
+        flavor="hive",
+    )
+
+
+def to_arrow(df):
+    """DataFrame de scraping → table Arrow compacte (sans la colonne Bookmaker)"""
+    frame = pd.DataFrame({
+        "Extraction": pd.to_datetime(df["Extraction"], errors="coerce", utc=True).dt.floor("ms"),
+        "Cutoff": pd.to_datetime(df["Cutoff"], errors="coerce", utc=True).dt.floor("ms"),
+        "Cote": pd.to_numeric(df["Cote"], errors="coerce").astype("float32"),
+    })
+    for col in TEXT_COLS:
+        frame[col] = df[col].astype("string").astype("category")
+    return pa.Table.from_pandas(frame[_schema().names], schema=_schema(), preserve_index=False)
+
+
+def append_snapshot(df, history_dir=None):
+    """Ajoute un snapshot (df_all) à l'historique ; renvoie la liste des fichiers écrits"""
+    if pa is None:
+        print("⚠️ pyarrow non installé : historique des cotes désactivé")
+        return []
+    if df is None or df.empty:
+        return []
+
+    root = Path(history_dir or HISTORY_DIR)
+    now = datetime.now(timezone.utc)
+    written = []
+
+    for bookmaker, group in df.groupby("Bookmaker", observed=True):
+        part_dir = root / f"date={now:%Y-%m-%d}" / f"bookmaker={bookmaker}"
+        part_dir.mkdir(parents=True, exist_ok=True)
+        path = part_dir / f"part-{now:%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+        pq.write_table(to_arrow(group), path, compression="zstd")
+        written.append(path)
+
+    return written
+
+
+def _dataset(history_dir=None):
+    root = Path(history_dir or HISTORY_DIR)
+    if not root.exists():
+        return None
+    return ds.dataset(root, format="parquet", partitioning=_partitioning())
+
+
+def _filter(start=None, end=None, bookmakers=None):
+    """Filtre Arrow : partitions (date, bookmaker) élaguées avant la lecture des fichiers"""
+    expr = None
+
+    def add(cond):
+        nonlocal expr
+        expr = cond if expr is None else expr & cond
+
+    if start is not None:
+        start = pd.Timestamp(start, tz="UTC") if pd.Timestamp(start).tzinfo is None else pd.Timestamp(start)
+        add(ds.field("date") >= start.strftime("%Y-%m-%d"))
+        add(ds.field("Extraction") >= pa.scalar(start.to_pydatetime(), pa.timestamp("ms", tz="UTC")))
+    if end is not None:
+        end = pd.Timestamp(end, tz="UTC") if pd.Timestamp(end).tzinfo is None else pd.Timestamp(end)
+        add(ds.field("date") <= end.strftime("%Y-%m-%d"))
+        add(ds.field("Extraction") < pa.scalar(end.to_pydatetime(), pa.timestamp("ms", tz="UTC")))
+    if bookmakers:
+        add(ds.field("bookmaker").isin(list(bookmakers)))
+    return expr
+
+
+def read_history(start=None, end=None, bookmakers=None, columns=None, history_dir=None):
+    """
+    Lit l'historique sur [start, end[ pour les bookmakers donnés.
+
+    start / end : datetime ou chaîne (UTC si sans fuseau)
+    columns     : sous-ensemble de colonnes à charger (None = toutes)
+    """
+    if pa is None:
+        raise ImportError("pyarrow est requis pour lire l'historique des cotes")
+    dataset = _dataset(history_dir)
+    if dataset is None:
+        return pd.DataFrame(columns=["Bookmaker", "Extraction", "Cutoff", *TEXT_COLS, "Cote"])
+
+    table = dataset.to_table(columns=columns, filter=_filter(start, end, bookmakers))
+    return _to_frame(table)
+
+
+def iter_history(start=None, end=None, bookmakers=None, columns=None, history_dir=None, batch_size=65536):
+    """Même filtre que read_history, mais par lots de DataFrames (mémoire bornée)"""
+    if pa is None:
+        raise ImportError("pyarrow est requis pour lire l'historique des cotes")
+    dataset = _dataset(history_dir)
+    if dataset is None:
+        return
+    scanner = dataset.scanner(columns=columns, filter=_filter(start, end, bookmakers), batch_size=batch_size)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield _to_frame(batch)
+
+
+def _to_frame(table):
+    df = table.to_pandas()
+    if "bookmaker" in df.columns:
+        df = df.rename(columns={"bookmaker": "Bookmaker"})
+        df["Bookmaker"] = df["Bookmaker"].astype("category")
+    return df.drop(columns=["date"], errors="ignore")
+
+
+def compact_day(day, history_dir=None):
+    """
+    Regroupe les fichiers d'un jour en un seul fichier par bookmaker
+    (720 snapshots/jour à 2 min → 1 fichier), pour accélérer les lectures.
+    Un jour en cours peut être compacté plusieurs fois : le fichier compact
+    précédent est fusionné avec les nouveaux snapshots.
+    """
+    if pa is None:
+        return 0
+    root = Path(history_dir or HISTORY_DIR) / f"date={day:%Y-%m-%d}"
+    compacted = 0
+    for part_dir in root.glob("bookmaker=*"):
+        snapshots = sorted(part_dir.glob("part-*.parquet"))
+        parts = sorted(part_dir.glob("compact-*.parquet")) + snapshots
+        if not snapshots or len(parts) <= 1:
+            continue
+        table = pa.concat_tables([pq.read_table(p, schema=_schema()) for p in parts]).unify_dictionaries()
+        target = part_dir / f"compact-{uuid.uuid4().hex[:8]}.parquet"
+        pq.write_table(table.sort_by("Extraction"), target, compression="zstd")
+        for p in parts:
+            p.unlink()
+        compacted += len(parts)
+    return compacted
+
+
+def compact_previous_days(days=2, history_dir=None):
+    """Compacte les `days` derniers jours complets (appelé en fin de run)"""
+    today = datetime.now(timezone.utc).date()
+    return sum(compact_day(today - timedelta(days=d), history_dir) for d in range(1, days + 1))
@@ -3,73 +3,158 @@
 Created on Sat Dec 27 19:10:34 2025
 
 @author: dioue
-"""
-
-from Excel_builder import build_excel
-
-from Scrap_Sportaza import scrape_sportaza
-from Scrap_Greenluck import scrape_greenluck
-from Scrap_Betify import scrape_betify
-from Scrap_MyStake import scrape_mystake
-
-# =========================
-# 🔽 DEF RUN : choisir les sports
-# =========================
 
+Exports Excel de plusieurs bookmakers en une commande :
 
-def run_sportaza():
-    return scrape_sportaza(
-        Id_sport=["1248","1596","1359","1373","1393","1387", "904", "923", "924", "1405", "1406","1407","1408", "1415","2245", "1356", "1659", "893","2239","2245","1410","1409","1402"]
-    )
+    python src/Run_Scrap.py                       # tous les bookmakers du registre
+    python src/Run_Scrap.py Betify Sportaza --tor --export-dir D:/Extraction
+    python src/Run_Scrap.py --formats xlsx parquet html --hours 48
 
+Les bookmakers sont scrapés en parallèle (threads) et chaque export est
+construit dans un processus dès que son scraping est terminé : la durée totale
+est celle du bookmaker le plus lent, pas la somme.
+"""
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from pathlib import Path
 
-def run_greenluck():
-    return scrape_greenluck(
-        Id_sport=["14", "15", "16", "17", "27","28","29","31", "32"]
-    )
+from Exporters import export, EXPORTERS
 
+from Bookmaker_registry import get_plugin, plugins
+from Name_matching import fill_reference_odds
+import Metrics
 
-def run_betify():
-    return scrape_betify(
-        Id_sport=["90","40","30","17","43", "44","45", "46", "48","49","50","102","103","105","36","190"],use_tor=False
-    )
+# =========================
+# 🔽 CHOIX DES BOOKMAKERS
+# =========================
+# Noms de plugins du registre (Scrap_*.py) : "Betify", "Greenluck", "Sportaza",
+# "MyStake", "Pinnacle". Les sports exportés sont ceux déclarés par le plugin (export_sports).
 
+BOOKMAKER = "Betify"
+USE_TOR = False   # None = transport déclaré par le plugin
 
-def run_mystake():
-    return scrape_mystake(
-        Id_sport=["16"] #77 F1
-    )
 
+WINDOW_HOURS = None   # events débutant dans les N prochaines heures (None = défaut Time_window)
 
-# =========================
-# 🔽 CHOIX DU BOOKMAKER
-# =========================
 
+def run(name=BOOKMAKER, use_tor=USE_TOR, window=WINDOW_HOURS):
+    plugin = get_plugin(name)
+    return plugin.run(plugin.export_sports, use_tor=use_tor, window=window, open_only=True)
 
-SCRAPER = run_betify
-# SCRAPER = run_greenluck
-# SCRAPER = run_betify
-# SCRAPER = run_sportaza
-# SCRAPER = run_mystake
 
 # =========================
-# 🔽 CHOIX PARAM build_excel
+# 🔽 CHOIX PARAM exports
 # =========================
-EXPORT_DIR = r"C:\Users\dioue\OneDrive\Bureau\Code Python\Scrapping-Bet\Extraction"
+EXPORT_DIR = Path(os.environ.get("SCRAP_EXPORT_DIR", Path(__file__).resolve().parent.parent / "Extraction"))
 KELLY = 4
 STAKE = 20
-
-
+REFERENCE_PINNACLE = True   # Remplit Cote_PS3838 avec la cote Pinnacle rapprochée
+REFERENCE = "Pinnacle"
+FORMATS = ("xlsx",)         # formats d'export : xlsx, parquet, csv, html (Exporters)
+EXCEL_WORKERS = max(1, min(4, os.cpu_count() or 1))   # processus de construction des exports
+
+
+def export_workbook(df, name, export_dir, kelly, stake, formats=FORMATS):
+    """
+    Construit les fichiers d'un bookmaker (exécuté dans un processus du pool).
+    Renvoie (chemins, métriques du processus) : les étapes analytics / excel / export_*
+    sont fusionnées dans celles du processus principal.
+    """
+    # Processus réutilisé (ou hérité par fork) : on ne renvoie que les métriques de cet export
+    Metrics.reset()
+    paths = export(df, formats, bookmaker_name=name, export_dir=str(export_dir),
+                   kelly_number=kelly, stake_number=stake)
+    return paths, Metrics.snapshot()
+
+
+def export_all(names=None, export_dir=EXPORT_DIR, kelly=KELLY, stake=STAKE,
+               reference=REFERENCE_PINNACLE, use_tor=USE_TOR, workers=EXCEL_WORKERS, formats=FORMATS,
+               window=WINDOW_HOURS):
+    """
+    Scrape `names` (défaut : tous les plugins) en parallèle et construit les
+    exports de chaque bookmaker ; renvoie {bookmaker: {format: chemin du fichier}}.
+    """
+    names = names or [p.name for p in plugins()]
+    Path(export_dir).mkdir(parents=True, exist_ok=True)
+    start = time.monotonic()
+
+    paths = {}
+    reference_df = None
+    # Classeurs en attente de la référence Pinnacle (tous sauf celui de Pinnacle)
+    waiting = {}
+    reference_pending = reference
+
+    with ThreadPoolExecutor(max_workers=len(names) + 1) as scrapers, \
+            ProcessPoolExecutor(max_workers=workers) as builders:
+        jobs = {scrapers.submit(run, name, use_tor, window): name for name in names}
+        # Référence Pinnacle : le résultat de son export s'il est demandé, sinon un scraping dédié
+        if reference and REFERENCE not in names:
+            jobs[scrapers.submit(lambda: get_plugin(REFERENCE).run(window=window))] = None
+        builds = {}
+
+        def submit_build(name, df):
+            if reference and name != REFERENCE and reference_df is not None and not reference_df.empty:
+                df = fill_reference_odds(df, reference_df)
+            builds[builders.submit(export_workbook, df, name, export_dir, kelly, stake, formats)] = name
+
+        for future in as_completed(jobs):
+            name = jobs[future]
+            try:
+                df = future.result()
+            except Exception as e:
+                print(f"⚠️ {name or REFERENCE} : {e}")
+                df = None
+
+            if reference and name in (None, REFERENCE):
+                reference_df, reference_pending = df, False
+                for pending, pending_df in waiting.items():
+                    submit_build(pending, pending_df)
+                waiting.clear()
+                if name is None:
+                    continue
+
+            print(f"⏱️ {name} : {time.monotonic() - start:.1f}s ({0 if df is None else len(df)} lignes)")
+            if df is None or df.empty:
+                continue
+            if reference_pending and name != REFERENCE:
+                waiting[name] = df
+                continue
+            submit_build(name, df)
+
+        for future in as_completed(builds):
+            name = builds[future]
+            try:
+                paths[name], metrics = future.result()
+                Metrics.merge(metrics)
+                for path in paths[name].values():
+                    print(f"✅ Export généré ({name}) :", path)
+            except Exception as e:
+                print(f"⚠️ Export {name} : {e}")
+
+    Metrics.observe_stage("export_all", time.monotonic() - start)
+    print(f"⏱️ Exports terminés en {time.monotonic() - start:.1f}s")
+    return paths
 
 
 if __name__ == "__main__":
-    df = SCRAPER()
-
-    path = build_excel(
-        df,
-        export_dir=EXPORT_DIR,
-        kelly_number=KELLY,
-        stake_number=STAKE
-    )
-
-    print("✅ Excel généré :", path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Exports Excel multi-bookmakers")
+    parser.add_argument("bookmakers", nargs="*", help="plugins à exporter (défaut : tous)")
+    parser.add_argument("--export-dir", default=EXPORT_DIR, help=f"dossier des classeurs (défaut : {EXPORT_DIR})")
+    parser.add_argument("--kelly", type=int, default=KELLY)
+    parser.add_argument("--stake", type=int, default=STAKE)
+    parser.add_argument("--tor", action=argparse.BooleanOptionalAction, default=USE_TOR,
+                        help="forcer (--tor) ou désactiver (--no-tor) Tor ; défaut : USE_TOR")
+    parser.add_argument("--no-reference", action="store_true", help="ne pas remplir la cote Pinnacle")
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=list(EXPORTERS),
+                        help="formats d'export (défaut : xlsx)")
+    parser.add_argument("--hours", type=float, default=WINDOW_HOURS,
+                        help="events débutant dans les N prochaines heures (défaut : sans limite)")
+    parser.add_argument("--workers", type=int, default=EXCEL_WORKERS, help="processus de construction des exports")
+    args = parser.parse_args()
+
+    export_all(args.bookmakers, Path(args.export_dir), args.kelly, args.stake,
+               reference=REFERENCE_PINNACLE and not args.no_reference, use_tor=args.tor, workers=args.workers,
+               formats=args.formats, window=args.hours)
+    Metrics.export()
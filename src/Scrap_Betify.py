@@ -1,65 +1,219 @@
-import requests
 import pandas as pd
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import pytz
+from Disk_cache import DiskCache
+from Http_client import http_get
+from Metrics import timed, observe_stage
+from Bookmaker_registry import register, get_plugin, RowBatch
+from Time_window import as_window
 
-# Configuration Tor
-TOR_PROXIES = {
-    'http': 'socks5h://127.0.0.1:9050',
-    'https': 'socks5h://127.0.0.1:9050'
-}
+# Parsing en flux des versions (optionnel) : mémoire proportionnelle aux events
+# retenus, au prix d'environ 3× plus de CPU que json. Sans ijson : r.json() puis filtrage
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
-def scrape_betify(Id_sport=None, use_tor=True) -> pd.DataFrame:
-    BRAND = "2491953325260546049"
+BRAND = "2491953325260546049"
+INDEX_URL = f"https://api-a-c7818b61-600.sptpub.com/api/v4/prematch/brand/{BRAND}/en/0"
+
+# Cache persistant des versions prematch, déjà filtrées :
+# {"sports": [...], "events": {...}, "tournaments": {...}} par ID de version
+version_cache = DiskCache("betify_versions")
+
+# Cache des descriptions v3 des variants (outrights / H2H), qui ne changent presque jamais
+description_cache = DiskCache("betify_descriptions", ttl=3 * 24 * 3600, max_entries=5000)
+V3_MAX_WORKERS = 8
+# Versions téléchargées en parallèle (réparties sur les circuits du pool Tor)
+VERSION_MAX_WORKERS = 8
+
+
+def iter_sections(chunks, sections):
+    """
+    Parse en flux un document JSON reçu par blocs et renvoie (section, clé, valeur)
+    pour chaque entrée des objets de premier niveau listés dans `sections`
+    ("events", ...). Seules les valeurs du bloc courant sont en mémoire.
+    """
+    sinks = {name: ijson.sendable_list() for name in sections}
+    coros = {name: ijson.kvitems_coro(sinks[name], name, use_float=True) for name in sections}
+
+    def drain():
+        for name, sink in sinks.items():
+            for key, value in sink:
+                yield name, key, value
+            del sink[:]
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        for coro in coros.values():
+            coro.send(chunk)
+        yield from drain()
+    for coro in coros.values():
+        coro.close()
+    yield from drain()
+
+
+def load_index(use_tor=True):
+    """Index /0 : versions prematch (et arbre des sports) ; None si indisponible"""
+    res = http_get(INDEX_URL, use_tor=use_tor)
+    if res.status_code != 200:
+        return None
+    return res.json()
+
+
+def load_version(url, keep, use_tor=True):
+    """
+    Télécharge une version prematch et ne garde que les events acceptés par keep(event)
+    (sport demandé, pas encore commencé) et leurs tournois.
+    Avec ijson la réponse est lue par blocs : les events écartés
+    ne sont jamais matérialisés.
+    """
+    stream = ijson is not None
+    r = http_get(url, use_tor=use_tor, stream=stream)
+    try:
+        if r.status_code != 200:
+            return None
+        events, tournaments = {}, {}
+        if stream:
+            for section, key, value in iter_sections(r.iter_content(64 * 1024), ("events", "tournaments")):
+                if section == "tournaments":
+                    tournaments[key] = value
+                elif keep(value):
+                    events[key] = value
+        else:
+            d = r.json()
+            events = {k: e for k, e in d.get("events", {}).items() if keep(e)}
+            tournaments = d.get("tournaments", {})
+            del d
+    finally:
+        r.close()
+
+    used = {e.get("desc", {}).get("tournament") for e in events.values()}
+    return {"events": events, "tournaments": {k: t for k, t in tournaments.items() if k in used}}
+
+
+@register("Betify", sports=["17", "43", "44", "45", "46", "48"],
+          export_sports=["90", "40", "30", "17", "43", "44", "45", "46", "48", "49", "50", "102", "103", "105", "36", "190"],
+          use_tor=True, deadline=90)
+@timed("scrape", "Betify")
+def scrape_betify(Id_sport=None, use_tor=True, deadline=None, window=None) -> pd.DataFrame:
     paris_tz = pytz.timezone("Europe/Paris")
     extraction_dt = datetime.now(paris_tz)
-    rows = []
+    batch = RowBatch("Betify")
+    window = as_window(window)
 
-    # Choix du mode de connexion
-    proxies = TOR_PROXIES if use_tor else None
     if Id_sport is None:
-        Id_sport = ["17","43", "44","45", "46", "48"]
-
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "application/json, text/plain, */*",
-        "Referer": "https://www.betify.com/"
-    }
+        Id_sport = get_plugin("Betify").sports
 
     # --- 1️⃣ Charger /0 ---
-    url_0 = f"https://api-a-c7818b61-600.sptpub.com/api/v4/prematch/brand/{BRAND}/en/0"
     try:
-        res = requests.get(url_0, headers=headers, proxies=proxies, timeout=30)
-        if res.status_code != 200:
-            return pd.DataFrame()
-        data_0 = res.json()
+        data_0 = load_index(use_tor)
+        if data_0 is None:
+            return batch.to_frame()
     except Exception as e:
         print(f"❌ Betify Error /0: {e}")
-        return pd.DataFrame()
+        return batch.to_frame()
 
     top_versions = data_0.get("top_events_versions", [])
     rest_versions = data_0.get("rest_events_versions", [])
     if len(top_versions) == 1 and isinstance(top_versions[0], list):
         top_versions = top_versions[0]
-    all_versions = list(set(top_versions + rest_versions))
+    all_versions = [str(v) for v in set(top_versions + rest_versions)]
 
-    # --- 2️⃣ Charger les versions ---
-    all_events, all_tournaments = {}, {}
+    # --- 2️⃣ Charger les versions (delta + parsing en flux) ---
+    # Les IDs de version sont adressés par contenu : une version déjà vue n'a
+    # pas changé, on réutilise ses events/tournaments depuis le cache disque.
+    # Les events d'autres sports ou déjà commencés sont écartés dès la lecture,
+    # et chaque version est libérée une fois fusionnée.
+    # Les versions à télécharger partent en parallèle (un circuit Tor par requête).
+    stage_start = time.perf_counter()
+    wanted = {str(s) for s in Id_sport}
+    # Horloge de la fenêtre (rejeu de fixtures : instant de l'enregistrement)
+    now_ts = window.start
+
+    def keep_event(event, sports=wanted):
+        desc = event.get("desc", {})
+        if str(desc.get("sport")) not in sports:
+            return False
+        scheduled = desc.get("scheduled")
+        return not scheduled or scheduled > now_ts
+
+    stale_versions = set(version_cache.keys()) - set(all_versions)
+    entries, to_fetch = {}, []
     for ver in all_versions:
+        entry = version_cache.get(ver)
+        cached_sports = set(entry.get("sports") or []) if entry else set()
+        # Version inconnue, ou mise en cache pour d'autres sports : (re)téléchargement
+        if entry is None or not wanted <= cached_sports:
+            # On garde aussi les sports déjà en cache : pas de va-et-vient entre deux listes de sports
+            to_fetch.append((ver, wanted | cached_sports))
+        else:
+            entries[ver] = entry
+    reused = len(entries)
+
+    def fetch_version(ver, sports):
+        if deadline and time.monotonic() > deadline:
+            return ver, "skipped"
         url = f"https://api-a-c7818b61-600.sptpub.com/api/v4/prematch/brand/{BRAND}/en/{ver}"
         try:
-            r = requests.get(url, headers=headers, proxies=proxies, timeout=20)
-            if r.status_code == 200:
-                d = r.json()
-                all_events.update(d.get("events", {}))
-                all_tournaments.update(d.get("tournaments", {}))
-        except: continue
-
-    # --- 3️⃣ & 4️⃣ Traitement des marchés ---
+            entry = load_version(url, lambda e: keep_event(e, sports), use_tor=use_tor)
+        except Exception:
+            return ver, None
+        if entry is not None:
+            entry["sports"] = sorted(sports)
+            version_cache.set(ver, entry)
+        return ver, entry
+
+    fetched, skipped = 0, 0
+    if to_fetch:
+        with ThreadPoolExecutor(max_workers=min(VERSION_MAX_WORKERS, len(to_fetch))) as executor:
+            futures = [executor.submit(fetch_version, ver, sports) for ver, sports in to_fetch]
+            for future in as_completed(futures):
+                ver, entry = future.result()
+                if entry == "skipped":
+                    skipped += 1
+                elif entry is not None:
+                    entries[ver] = entry
+                    fetched += 1
+
+    # Fusion dans l'ordre de l'index (résultat identique quel que soit l'ordre des téléchargements).
+    # Le cache garde tous les events à venir ; la fenêtre est appliquée ici, avant
+    # le traitement des marchés et les appels v3 par event.
+    all_events, all_tournaments = {}, {}
+    for ver in all_versions:
+        entry = entries.pop(ver, None)
+        if entry is None:
+            continue
+        for event_id, event in entry["events"].items():
+            if keep_event(event) and window.contains(event.get("desc", {}).get("scheduled")):
+                all_events[event_id] = event
+                tournament_id = event.get("desc", {}).get("tournament")
+                if tournament_id in entry["tournaments"]:
+                    all_tournaments[tournament_id] = entry["tournaments"][tournament_id]
+        del entry
+
+    # Les versions sorties de l'index ne reviendront plus
+    for ver in stale_versions:
+        version_cache.delete(ver)
+
+    if skipped:
+        print(f"⏱️ Betify : deadline atteinte, {skipped} version(s) non chargée(s)")
+    print(f"📦 Betify : {len(all_versions)} versions, {fetched} téléchargées, "
+          f"{reused} en cache, {len(stale_versions)} purgées, {len(all_events)} events retenus")
+    observe_stage("versions", time.perf_counter() - stage_start, "Betify")
+
+    # --- 3️⃣ Traitement des marchés ---
+    stage_start = time.perf_counter()
+    variant_tasks = []
     for event_id, event in all_events.items():
+        if deadline and time.monotonic() > deadline:
+            print("⏱️ Betify : deadline atteinte, retour des cotes déjà collectées")
+            break
         desc = event.get("desc", {})
-        if desc.get("sport") not in Id_sport: continue
-        
+
         tournament_name = all_tournaments.get(desc.get("tournament"), {}).get("name")
         cutoff = datetime.fromtimestamp(desc["scheduled"], paris_tz) if desc.get("scheduled") else None
         
@@ -72,31 +226,67 @@ def scrape_betify(Id_sport=None, use_tor=True) -> pd.DataFrame:
                     competitors = [c.get("name") for c in desc.get("competitors", [])]
                     sorted_o = sorted(outcomes.items(), key=lambda x: int(x[0]))
                     for idx, (_, odd) in enumerate(sorted_o):
-                        rows.append({
-                            "Bookmaker": "Betify", "Competition": tournament_name,
-                            "Extraction": extraction_dt, "Cutoff": cutoff,
-                            "Evenement": desc.get("slug"), "Cote": float(odd.get("k")),
-                            "Competiteur": competitors[idx] if idx < len(competitors) else None
-                        })
+                        batch.append(tournament_name, desc.get("slug"),
+                                     competitors[idx] if idx < len(competitors) else None,
+                                     float(odd.get("k")), cutoff)
                 
-                # Cas avec Variant (Endpoint v3)
+                # Cas avec Variant (Endpoint v3) : résolu en lot plus bas
                 else:
                     v_id = variant_key.split("variant=")[-1]
-                    v3_url = f"https://api-a-c7818b61-600.sptpub.com/api/v3/descriptions/brand/{BRAND}/event/{event_id}/market/{market_id}@variant={v_id}/fr"
-                    try:
-                        v3_res = requests.get(v3_url, headers=headers, proxies=proxies, timeout=20)
-                        v3_data = v3_res.json()
-                        v_list = v3_data.get("markets", {}).get(market_id, {}).get("variants", {}).get(f"variant={v_id}", [])
-                        if v_list:
-                            v_info = v_list[0]
-                            id_map = {o["id"]: o["name"] for o in v_info.get("outcomes", [])}
-                            for oid, odd in outcomes.items():
-                                rows.append({
-                                    "Bookmaker": "Betify", "Competition": tournament_name,
-                                    "Extraction": extraction_dt, "Cutoff": cutoff,
-                                    "Evenement": v_info.get("name", desc.get("slug")),
-                                    "Competiteur": id_map.get(oid, oid), "Cote": float(odd.get("k"))
-                                })
-                    except: continue
-
-    return pd.DataFrame(rows) if rows else pd.DataFrame()
\ No newline at end of file
+                    variant_tasks.append((event_id, market_id, v_id, outcomes, tournament_name, cutoff, desc.get("slug")))
+
+    observe_stage("parse", time.perf_counter() - stage_start, "Betify")
+
+    # --- 4️⃣ Descriptions des variants (cache disque + requêtes concurrentes) ---
+    stage_start = time.perf_counter()
+    def fetch_description(event_id, market_id, v_id):
+        if deadline and time.monotonic() > deadline:
+            return None
+        v3_url = f"https://api-a-c7818b61-600.sptpub.com/api/v3/descriptions/brand/{BRAND}/event/{event_id}/market/{market_id}@variant={v_id}/fr"
+        v3_res = http_get(v3_url, use_tor=use_tor)
+        v3_res.raise_for_status()
+        v_list = v3_res.json().get("markets", {}).get(market_id, {}).get("variants", {}).get(f"variant={v_id}", [])
+        return v_list[0] if v_list else None
+
+    descriptions, misses = {}, []
+    for event_id, market_id, v_id, *_ in variant_tasks:
+        key = f"{event_id}/{market_id}/{v_id}"
+        if key in descriptions:
+            continue
+        cached = description_cache.get(key)
+        if cached is not None:
+            descriptions[key] = cached
+        else:
+            descriptions[key] = None
+            misses.append((key, event_id, market_id, v_id))
+
+    errors = 0
+    if misses:
+        with ThreadPoolExecutor(max_workers=V3_MAX_WORKERS) as executor:
+            futures = {executor.submit(fetch_description, e, m, v): key for key, e, m, v in misses}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    v_info = future.result()
+                except Exception:
+                    errors += 1
+                    continue
+                if v_info:
+                    descriptions[key] = v_info
+                    description_cache.set(key, v_info)
+
+    if variant_tasks:
+        print(f"📖 Betify : {len(descriptions)} descriptions de variants, {len(misses)} requêtes v3, {errors} erreur(s)")
+    description_cache.prune()
+    observe_stage("v3_descriptions", time.perf_counter() - stage_start, "Betify")
+
+    for event_id, market_id, v_id, outcomes, tournament_name, cutoff, slug in variant_tasks:
+        v_info = descriptions.get(f"{event_id}/{market_id}/{v_id}")
+        if not v_info:
+            continue
+        id_map = {o["id"]: o["name"] for o in v_info.get("outcomes", [])}
+        for oid, odd in outcomes.items():
+            batch.append(tournament_name, v_info.get("name", slug), id_map.get(oid, oid),
+                         float(odd.get("k")), cutoff)
+
+    return batch.to_frame(extraction_dt)
\ No newline at end of file
@@ -1,82 +1,119 @@
-import requests, pandas as pd, re
-from datetime import datetime
-import pytz
+import os
+import pandas as pd, re, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from Disk_cache import DiskCache
+from Http_client import conditional_get
+from Metrics import timed, observe_stage
+from Bookmaker_registry import register, get_plugin, RowBatch
+from Time_window import as_window
 
-def scrape_greenluck(Id_sport=None) -> pd.DataFrame:
+BASE_CACHE = "https://pre-161o-sp.sbx.bet/cache/161/fr/EE/Europe-Paris/init"
+
+# Listes d'events interrogées par sport ({BASE_CACHE}/{sport}/{liste}.json).
+# Par défaut la page "welcome-popular" ; SCRAP_GREENLUCK_LISTINGS="a,b" pour en changer.
+# Pas de mode "catalogue complet" : aucune liste complète par sport (ni sa pagination)
+# n'a été vérifiée sur une fixture enregistrée. Une liste ajoutée ici est lue en une
+# seule page, sans suivre de pagination.
+DEFAULT_LISTINGS = tuple(os.environ.get("SCRAP_GREENLUCK_LISTINGS", "welcome-popular").split(","))
+
+# Lignes déjà parsées par page, revalidées par ETag / Last-Modified
+page_cache = DiskCache("greenluck_pages", ttl=24 * 3600, max_entries=500)
+MAX_WORKERS = 8
+
+NON_NAME_RE = re.compile(r"[^a-zA-Z0-9\s]")
+
+
+def normalize_name(name):
+    return NON_NAME_RE.sub("", name).strip().lower() if name else ""
+
+
+def parse_listing(response):
+    """Lignes [id, compétition, événement, compétiteur, cote, date_start] d'une page (sérialisable JSON)"""
+    rows = []
+    for event in response.json().get("events", []):
+        main_odds = event.get("main_odds", {}).get("main", {})
+        if len(main_odds) != 2:
+            continue
+
+        sorted_odds = sorted(main_odds.values(), key=lambda x: x.get("team_side"))
+        event_name = f"{sorted_odds[0]['team_name']} vs {sorted_odds[1]['team_name']}"
+        # Identifiant pour dédoublonner un event présent dans plusieurs listes
+        event_id = event.get("id") or f"{event.get('tournament_name')}|{event_name}"
+
+        for odd in sorted_odds:
+            # Marchés Oui / Non : pas des face-à-face
+            if normalize_name(odd.get("team_name")) in ("oui", "non"):
+                continue
+            # date_start ISO converti en une fois (vectorisé) par RowBatch.to_frame
+            rows.append([event_id, event.get("tournament_name"), event_name, odd.get("team_name"),
+                         odd.get("odd_value"), event.get("date_start")])
+    return rows
+
+
+@register("Greenluck", sports=["14", "15", "16", "17", "27", "28", "31"],
+          export_sports=["14", "15", "16", "17", "27", "28", "29", "31", "32"], deadline=45)
+@timed("scrape", "Greenluck")
+def scrape_greenluck(Id_sport=None, deadline=None, listings=None, window=None) -> pd.DataFrame:
     """
     Scrape Greenluck face-à-face pour les sports donnés.
 
     Id_sport : liste d'IDs de sports (ex: ["16","27","28"]), None = valeur par défaut.
+    deadline : instant (time.monotonic()) après lequel on rend ce qu'on a déjà collecté.
+    listings : listes d'events par sport (None = DEFAULT_LISTINGS).
+    window   : fenêtre de temps (Time_window) des events gardés.
     """
-    paris_tz = pytz.timezone("Europe/Paris")
-    all_rows = []
+    batch = RowBatch("Greenluck")
+    window = as_window(window)
 
     # Valeur par défaut
     if Id_sport is None:
-        Id_sport = ["16","27","28"]  # format chaîne comme pour Sportaza
+        Id_sport = get_plugin("Greenluck").sports
+    if listings is None:
+        listings = DEFAULT_LISTINGS
 
-    BASE_CACHE = "https://pre-161o-sp.sbx.bet/cache/161/fr/EE/Europe-Paris/init"
+    pages = [(sport_id, listing) for sport_id in Id_sport for listing in listings]
 
-    for sport_id in Id_sport:
-        ENDPOINT = f"{BASE_CACHE}/{sport_id}/welcome-popular.json?filters="
-        response = requests.get(ENDPOINT)
-        if response.status_code != 200:
-            print(f"⚠️ Erreur {response.status_code} pour SPORT_ID {sport_id}, passage au suivant")
-            continue
-        data = response.json()
-        events = data.get("events", [])
+    def fetch(sport_id, listing):
+        if deadline and time.monotonic() > deadline:
+            return None, False
+        url = f"{BASE_CACHE}/{sport_id}/{listing}.json"
+        parse_start = time.perf_counter()
+        try:
+            rows, changed = conditional_get(url, page_cache, parse_listing, params={"filters": ""})
+        except Exception as e:
+            print(f"⚠️ Erreur pour SPORT_ID {sport_id} ({listing}) : {e}")
+            return None, False
+        if changed:
+            observe_stage("parse", time.perf_counter() - parse_start, "Greenluck")
+        return rows, changed
+
+    results, changed_pages, skipped = {}, 0, 0
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(pages) or 1)) as executor:
+        futures = {executor.submit(fetch, *page): page for page in pages}
+        for future in as_completed(futures):
+            rows, changed = future.result()
+            if rows is None:
+                skipped += 1
+                continue
+            results[futures[future]] = rows
+            changed_pages += changed
+
+    if deadline and time.monotonic() > deadline and skipped:
+        print("⏱️ Greenluck : deadline atteinte, retour des cotes déjà collectées")
+    print(f"📦 Greenluck : {len(results)} page(s), {changed_pages} modifiée(s), "
+          f"{len(results) - changed_pages} inchangée(s)")
+    page_cache.prune()
 
-        for event in events:
-            main_odds = event.get("main_odds", {}).get("main", {})
-            if len(main_odds) != 2:
+    # Fusion dans l'ordre des sports ; un event vu dans une liste précédente est ignoré.
+    # Les pages en cache gardent tous les events : la fenêtre s'applique ici.
+    seen = set()
+    for page in pages:
+        page_ids = set()
+        for event_id, competition, event_name, competitor, cote, date_raw in results.get(page, []):
+            if event_id in seen or not window.contains(date_raw):
                 continue
+            page_ids.add(event_id)
+            batch.append(competition, event_name, competitor, cote, date_raw)
+        seen |= page_ids
 
-            sorted_odds = sorted(main_odds.values(), key=lambda x: x.get("team_side"))
-
-            def normalize_name(name):
-                return re.sub(r"[^a-zA-Z0-9\s]", "", name).strip().lower() if name else ""
-
-            name1 = normalize_name(sorted_odds[0].get("team_name"))
-            name2 = normalize_name(sorted_odds[1].get("team_name"))
-
-            date_raw = event.get("date_start")
-            cutoff = (datetime.fromisoformat(date_raw.replace("Z", "+00:00"))
-                      .astimezone(paris_tz) if date_raw else None)
-
-            # Ligne 1
-            all_rows.append({
-                "Bookmaker": "Greenluck",
-                "Competition": event.get("tournament_name"),
-                "Evenement": f"{sorted_odds[0]['team_name']} vs {sorted_odds[1]['team_name']}",
-                "Competiteur": sorted_odds[0].get("team_name"),
-                "Cote": sorted_odds[0].get("odd_value"),
-                "Cutoff": cutoff,
-                "Extraction": datetime.now(paris_tz)
-            })
-
-            # Ligne 2
-            all_rows.append({
-                "Bookmaker": "Greenluck",
-                "Competition": event.get("tournament_name"),
-                "Evenement": f"{sorted_odds[0]['team_name']} vs {sorted_odds[1]['team_name']}",
-                "Competiteur": sorted_odds[1].get("team_name"),
-                "Cote": sorted_odds[1].get("odd_value"),
-                "Cutoff": cutoff,
-                "Extraction": datetime.now(paris_tz)
-            })
-
-    df = pd.DataFrame(all_rows)
-    df = df[~df["Competiteur"].str.lower().isin(["oui", "non"])]
-    
-    
-    return df[
-        [
-            "Bookmaker",
-            "Competition",
-            "Extraction",
-            "Cutoff",
-            "Evenement",
-            "Competiteur",
-            "Cote"
-        ]
-    ]
+    return batch.to_frame()
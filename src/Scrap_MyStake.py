@@ -7,119 +7,177 @@ Created on Sat Dec 27 18:38:53 2025
 
 # mystake.py
 
-import requests
 import json
+import hashlib
 import pandas as pd
-from datetime import datetime
-import pytz
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from Http_client import http_get
+from Metrics import timed
+from Disk_cache import DiskCache
+from Bookmaker_registry import register, get_plugin, RowBatch
+from Time_window import as_window
 
+MAX_WORKERS = 8
 
-def scrape_mystake(Id_sport=None) -> pd.DataFrame:
+# Arbre getheader gardé peu de temps ; lignes par champ réutilisées tant que
+# l'empreinte (GameCount / GameSmallItems) du champ ne change pas
+HEADER_TTL = 60
+CHAMP_TTL = 10 * 60
+header_cache = DiskCache("mystake_header", ttl=HEADER_TTL)
+# Lignes stockées en listes [Competition, Evenement, Competiteur, Cote, Cutoff ISO]
+champ_cache = DiskCache("mystake_champ_rows", ttl=CHAMP_TTL, max_entries=2000)
+
+
+
+def load_json(response):
+    """Gestion du format de réponse MyStake (parfois string JSON)"""
+    raw_data = response.json()
+    return json.loads(raw_data) if isinstance(raw_data, str) else raw_data
+
+
+def get_header():
+    """Arbre getheader/en, mis en cache HEADER_TTL secondes"""
+    data = header_cache.get("header")
+    if data is None:
+        response = http_get("https://analytics-sp.googleserv.tech/api/sport/getheader/en")
+        response.raise_for_status()
+        data = load_json(response)
+        header_cache.set("header", data)
+    return data
+
+
+def champ_signature(champ):
+    """
+    Empreinte d'un champ : change dès qu'un duel est ajouté / retiré ou que son
+    contenu (GameSmallItems, cotes comprises) bouge ; les lignes en cache ne
+    survivent donc pas à un mouvement de cote.
+    """
+    items = json.dumps(champ.get("GameSmallItems", {}), sort_keys=True, default=str)
+    return f"{champ.get('GameCount', 0)}:{hashlib.sha1(items.encode('utf-8')).hexdigest()}"
+
+
+@timed("parse", "MyStake")
+def parse_outright(f_data, champ_name):
+    """
+    Lignes face-à-face d'une réponse GetOutrightFull :
+    [Competition, Evenement, Competiteur, Cote, Cutoff ISO] (sérialisables pour le cache)
+    """
+    rows = []
+    teams = f_data.get("Teams", {})
+    outrights = f_data.get("Outrights", {})
+
+    for out_val in outrights.values():
+        event_name = out_val.get("OutrighNameItem", {}).get("Name")
+        start_raw = out_val.get("st")
+
+        games = out_val.get("Game", {})
+        # Uniquement les Face-à-face (2 sélections)
+        if len(games) == 2:
+            for g_val in games.values():
+                coureur_id = str(g_val.get("t1"))
+                name = teams.get(coureur_id, {}).get("Name", "Inconnu")
+
+                ev = g_val.get("ev", {})
+                if ev:
+                    first_ev_id = list(ev.keys())[0]
+                    price = ev[first_ev_id].get("coef")
+
+                    rows.append([champ_name, event_name, name, price, start_raw])
+    return rows
+
+
+@register("MyStake", sports=["16", "77"], export_sports=["16"], deadline=60)
+@timed("scrape", "MyStake")
+def scrape_mystake(Id_sport=None, deadline=None, window=None) -> pd.DataFrame:
     """
     Scrape MyStake (Face-à-face / H2H)
     
     Id_sport : liste des IDs de sports que tu veux scraper, ex: ["16","2"]
-               Si None, utilise ["16"] (Cyclisme) par défaut.
+               Si None, utilise les sports déclarés par le plugin.
+    deadline : instant (time.monotonic()) après lequel on rend ce qu'on a déjà collecté.
+    window   : fenêtre de temps (Time_window) des duels gardés.
     """
-    paris_tz = pytz.timezone("Europe/Paris")
     rows = []
+    window = as_window(window)
 
-    # Valeur par défaut (Cyclisme) si rien n'est passé
+    # Valeur par défaut si rien n'est passé
     if Id_sport is None:
-        Id_sport = ["16","8"]
+        Id_sport = get_plugin("MyStake").sports
 
-    url_header = "https://analytics-sp.googleserv.tech/api/sport/getheader/en"
-    
     try:
-        response = requests.get(url_header)
-        response.raise_for_status()
-        
-        # Gestion du format de réponse MyStake (parfois string JSON)
-        raw_data = response.json()
-        data = json.loads(raw_data) if isinstance(raw_data, str) else raw_data
-        
+        data = get_header()
         en_sports = data.get("EN", {}).get("Sports", {})
 
+        # Identification des IDs de duels H2H (IDs négatifs et GameCount > 1)
+        # Un champ dont l'empreinte n'a pas bougé reprend ses lignes en cache.
+        h2h_tasks, changed_champs = [], {}
+        reused = 0
         for s_id in Id_sport:
             sport_node = en_sports.get(str(s_id))
             if not sport_node:
                 continue
 
-            # Identification des IDs de duels H2H (IDs négatifs et GameCount > 1)
-            h2h_tasks = []
             for reg in sport_node.get("Regions", {}).values():
-                for champ in reg.get("Champs", {}).values():
-                    if champ.get("GameCount", 0) > 1:
-                        champ_name = champ.get("Name")
-                        items = champ.get("GameSmallItems", {})
-                        for g_id in items.keys():
-                            if str(g_id).startswith("-"):
-                                h2h_tasks.append((str(g_id).lstrip('-'), champ_name))
-
-            # Extraction des détails pour chaque duel identifié
-            for o_id, champ_name in h2h_tasks:
-                try:
-                    url_full = f"https://analytics-sp.googleserv.tech/api/sport/GetOutrightFull/en/{o_id}"
-                    resp_full = requests.get(url_full, timeout=5)
-                    f_json = resp_full.json()
-                    f_data = json.loads(f_json) if isinstance(f_json, str) else f_json
-                    
-                    teams = f_data.get("Teams", {})
-                    outrights = f_data.get("Outrights", {})
-                    
-                    for out_val in outrights.values():
-                        event_name = out_val.get("OutrighNameItem", {}).get("Name")
-                        start_raw = out_val.get("st")
-                        
-                        cutoff = (
-                            datetime.fromisoformat(start_raw).astimezone(paris_tz)
-                            if start_raw else None
-                        )
-                        
-                        games = out_val.get("Game", {})
-                        # Uniquement les Face-à-face (2 sélections)
-                        if len(games) == 2:
-                            for g_val in games.values():
-                                coureur_id = str(g_val.get("t1"))
-                                name = teams.get(coureur_id, {}).get("Name", "Inconnu")
-                                
-                                ev = g_val.get("ev", {})
-                                if ev:
-                                    first_ev_id = list(ev.keys())[0]
-                                    price = ev[first_ev_id].get("coef")
-                                    
-                                    rows.append({
-                                        "Bookmaker": "MyStake",
-                                        "Competition": champ_name,
-                                        "Evenement": event_name,
-                                        "Competiteur": name,
-                                        "Cote": price,
-                                        "Cutoff": cutoff,
-                                    })
-                except:
-                    continue
+                for champ_id, champ in reg.get("Champs", {}).items():
+                    if champ.get("GameCount", 0) <= 1:
+                        continue
+                    champ_name = champ.get("Name")
+                    signature = champ_signature(champ)
+
+                    cached = champ_cache.get(champ_id)
+                    if cached and cached.get("signature") == signature:
+                        rows.extend(cached["rows"])
+                        reused += 1
+                        continue
+
+                    o_ids = [str(g_id).lstrip('-') for g_id in champ.get("GameSmallItems", {}).keys()
+                             if str(g_id).startswith("-")]
+                    changed_champs[champ_id] = {"signature": signature, "rows": [], "pending": len(o_ids)}
+                    h2h_tasks.extend((champ_id, o_id, champ_name) for o_id in o_ids)
+
+        # Extraction des détails pour chaque duel identifié, en parallèle
+        def fetch_outright(o_id):
+            if deadline and time.monotonic() > deadline:
+                return None
+            url_full = f"https://analytics-sp.googleserv.tech/api/sport/GetOutrightFull/en/{o_id}"
+            return load_json(http_get(url_full, timeout=5, retries=0))
+
+        if h2h_tasks:
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                futures = {executor.submit(fetch_outright, o_id): (champ_id, champ_name)
+                           for champ_id, o_id, champ_name in h2h_tasks}
+                for future in as_completed(futures):
+                    champ_id, champ_name = futures[future]
+                    try:
+                        f_data = future.result()
+                    except Exception:
+                        continue
+                    if f_data is None:
+                        continue
+                    state = changed_champs[champ_id]
+                    state["rows"].extend(parse_outright(f_data, champ_name))
+                    state["pending"] -= 1
+
+        # On ne met en cache que les champs dont tous les duels ont été récupérés
+        for champ_id, state in changed_champs.items():
+            rows.extend(state["rows"])
+            if state["pending"] == 0:
+                champ_cache.set(champ_id, {"signature": state["signature"], "rows": state["rows"]})
+
+        print(f"🔁 MyStake : {reused} champ(s) inchangé(s), {len(changed_champs)} rafraîchi(s), {len(h2h_tasks)} requête(s)")
+        champ_cache.prune()
 
     except Exception as e:
         print(f"Erreur MyStake: {e}")
 
-    df = pd.DataFrame(rows)
-
-    if df.empty:
-        return pd.DataFrame(columns=["Bookmaker", "Competition", "Extraction", "Cutoff", "Evenement", "Competiteur", "Cote"])
-
-    df["Extraction"] = datetime.now(paris_tz)
-
-    return df[
-        [
-            "Bookmaker",
-            "Competition",
-            "Extraction",
-            "Cutoff",
-            "Evenement",
-            "Competiteur",
-            "Cote"
-        ]
-    ]
+    # Cutoff ISO converti en une fois (vectorisé) par RowBatch.to_frame.
+    # Les lignes en cache gardent tous les duels : la fenêtre s'applique ici.
+    batch = RowBatch("MyStake")
+    for row in rows:
+        if window.contains(row[4]):
+            batch.append(*row)
+    return batch.to_frame()
 
 # --- BLOC DE TEST ---
 if __name__ == "__main__":
@@ -4,50 +4,97 @@ Created on Sat Jan 30 2026
 @author: dioue
 """
 # pinnacle.py
-import requests
 import pandas as pd
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import pytz
+from Http_client import http_get
+from Metrics import timed, observe_stage
+from Bookmaker_registry import register, get_plugin, RowBatch
+from Time_window import as_window
 
-def scrape_pinnacle(Id_sport=None) -> pd.DataFrame:
+MAX_WORKERS = 8
+
+
+def american_to_decimal(price):
+    """Convertit une cote américaine (+150 / -120) en cote décimale"""
+    if price is None:
+        return None
+    price = float(price)
+    if price > 0:
+        return round(1 + price / 100, 3)
+    if price < 0:
+        return round(1 + 100 / abs(price), 3)
+    return None
+
+
+def index_moneyline(markets):
+    """Index matchupId → {"home": cote, "away": cote} des moneylines plein match"""
+    index = {}
+    for market in markets:
+        if market.get("type") != "moneyline" or market.get("period") != 0 or market.get("isAlternate"):
+            continue
+        index[market.get("matchupId")] = {
+            p.get("designation"): american_to_decimal(p.get("price"))
+            for p in market.get("prices", [])
+        }
+    return index
+
+
+@register("Pinnacle", sports=["40", "41", "42", "43", "44", "45"], deadline=45)
+@timed("scrape", "Pinnacle")
+def scrape_pinnacle(Id_sport=None, deadline=None, window=None) -> pd.DataFrame:
     """
     Scrape Pinnacle (moneyline markets) - Version simplifiée
     
     Id_sport : liste des IDs de sports que tu veux scraper, ex: ["10", "45"]
                Si None, utilise la liste par défaut.
+    deadline : instant (time.monotonic()) après lequel on rend ce qu'on a déjà collecté.
+    window   : fenêtre de temps (Time_window) des events gardés.
     """
     paris_tz = pytz.timezone("Europe/Paris")
-    rows = []
+    batch = RowBatch("Pinnacle")
+    window = as_window(window)
     
     # Valeur par défaut si rien n'est passé
     if Id_sport is None:
-        Id_sport = [ "40","41", "42","43","44", "45"] ## https://guest.api.arcadia.pinnacle.com/0.1/sports?brandId=0
+        Id_sport = get_plugin("Pinnacle").sports ## https://guest.api.arcadia.pinnacle.com/0.1/sports?brandId=0
     
     BASE_URL = "https://guest.api.arcadia.pinnacle.com/0.1"
-    HEADERS = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                      "AppleWebKit/537.36 (KHTML, like Gecko) "
-                      "Chrome/129.0 Safari/537.36",
-        "Accept": "application/json, text/plain, */*",
-        "Origin": "https://www.pinnacle.com",
-        "Referer": "https://www.pinnacle.com/",
-    }
-    
+
+    def fetch_json(url):
+        if deadline and time.monotonic() > deadline:
+            return []
+        resp = http_get(url)
+        resp.raise_for_status()
+        return resp.json()
+
+    # Matchups et cotes moneyline en masse : 2 requêtes par sport, toutes en parallèle
+    jobs = {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for sport_id in Id_sport:
+            jobs[executor.submit(fetch_json, f"{BASE_URL}/sports/{sport_id}/matchups?withSpecials=false&brandId=0")] = (sport_id, "matchups")
+            jobs[executor.submit(fetch_json, f"{BASE_URL}/sports/{sport_id}/markets/straight?primaryOnly=false&withSpecials=false")] = (sport_id, "markets")
+
+        results = {}
+        for future in as_completed(jobs):
+            sport_id, kind = jobs[future]
+            try:
+                results[(sport_id, kind)] = future.result()
+            except Exception as e:
+                print(f"   ⚠️ Erreur sport {sport_id} ({kind}): {e}")
+
     # Boucle sur chaque sport
+    parse_start = time.perf_counter()
     for sport_id in Id_sport:
         print(f"🔍 Scraping sport ID: {sport_id}")
-        
-        # Récupérer tous les matchups du sport (contient déjà les infos de base)
-        url_matchups = f"{BASE_URL}/sports/{sport_id}/matchups?withSpecials=false&brandId=0"
-        
-        try:
-            resp = requests.get(url_matchups, headers=HEADERS)
-            resp.raise_for_status()
-            matchups = resp.json()
-    #        print(f"   ✅ {len(matchups)} matchups trouvés")
-        except Exception as e:
-            print(f"   ⚠️ Erreur sport {sport_id}: {e}")
+        matchups = results.get((sport_id, "matchups"))
+        if matchups is None:
             continue
+
+        # Index matchupId → {designation: cote décimale}
+        prices = index_moneyline(results.get((sport_id, "markets")) or [])
         
         matchups_added = 0
         
@@ -69,17 +116,16 @@ def scrape_pinnacle(Id_sport=None) -> pd.DataFrame:
             if period.get("status") != "open":
                 continue
             
-            # Récupérer cutoff
+            # Exclure si cutoff hors fenêtre (déjà passé ou trop lointain), avant tout parsing
             cut_off_str = period.get("cutoffAt")
+            if not window.contains(cut_off_str):
+                continue
+
             cutoff = None
             if cut_off_str:
                 dt_utc = datetime.fromisoformat(cut_off_str.replace("Z", "+00:00"))
                 cutoff = dt_utc.astimezone(paris_tz)
             
-            # Exclure si cutoff déjà passé
-            if cutoff and cutoff < datetime.now(paris_tz):
-                continue
-            
             # Récupérer les infos
             league = m.get("league", {})
             league_name = league.get("name")
@@ -88,44 +134,16 @@ def scrape_pinnacle(Id_sport=None) -> pd.DataFrame:
             participant_2 = participants[1].get("name")
             event_name = f"{participant_1} vs {participant_2}"
             
-            # ⚠️ LIMITATION : On ne peut pas récupérer les cotes exactes sans l'API markets
-            # On crée quand même les lignes pour indiquer que le match existe
-            # Tu devras peut-être utiliser un autre endpoint ou scraper le site web
-            
-            rows.append({
-                "Bookmaker": "Pinnacle",
-                "Competition": league_name,
-                "Evenement": event_name,
-                "Competiteur": participant_1,
-                "Cote": None,  # ⚠️ Non disponible sans API markets
-                "Cutoff": cutoff,
-            })
-            
-            rows.append({
-                "Bookmaker": "Pinnacle",
-                "Competition": league_name,
-                "Evenement": event_name,
-                "Competiteur": participant_2,
-                "Cote": None,  # ⚠️ Non disponible sans API markets
-                "Cutoff": cutoff,
-            })
+            matchup_prices = prices.get(m.get("id"), {})
+            for i, participant in enumerate(participants):
+                alignment = participant.get("alignment") or ("home", "away")[i]
+                batch.append(league_name, event_name, participant.get("name"),
+                             matchup_prices.get(alignment), cutoff)
             
             matchups_added += 1
         
-  #      print(f"   ✅ {matchups_added} matchups ajoutés (cotes non disponibles)")
+  #      print(f"   ✅ {matchups_added} matchups ajoutés")
     
-    # Créer le DataFrame
-    df = pd.DataFrame(rows)
-    df["Extraction"] = datetime.now(paris_tz)
-    
-    return df[
-        [
-            "Bookmaker",
-            "Competition",
-            "Extraction",
-            "Cutoff",
-            "Evenement",
-            "Competiteur",
-            "Cote"
-        ]
-    ]
\ No newline at end of file
+    observe_stage("parse", time.perf_counter() - parse_start, "Pinnacle")
+
+    return batch.to_frame()
@@ -7,99 +7,52 @@ Created on Sat Dec 27 18:38:53 2025
 
 # sportaza.py
 
-import requests
 import pandas as pd
-from datetime import datetime
-import pytz
-
-
-def scrape_sportaza(Id_sport=None) -> pd.DataFrame:
+from Altenar_parser import fetch_altenar, index_payload, iter_h2h_markets
+from Metrics import timed, stage
+from Bookmaker_registry import register, get_plugin, RowBatch
+from Time_window import as_window
+
+
+@register("Sportaza", sports=["1596", "1359", "1373", "1393", "1387", "904", "923", "924", "1405", "1406", "1415",
+                              "2245", "1356", "1659", "893", "2239"],
+          export_sports=["1248", "1596", "1359", "1373", "1393", "1387", "904", "923", "924", "1405", "1406", "1407",
+                         "1408", "1415", "2245", "1356", "1659", "893", "2239", "1410", "1409", "1402"],
+          deadline=45)
+@timed("scrape", "Sportaza")
+def scrape_sportaza(Id_sport=None, deadline=None, window=None) -> pd.DataFrame:
     """
     Scrape Sportaza (face-à-face / sc==2)
     
     Id_sport : liste des IDs de sports que tu veux scraper, ex: ["1359","923"]
                Si None, utilise la liste par défaut.
+    deadline : instant (time.monotonic()) après lequel on rend ce qu'on a déjà collecté.
+    window   : fenêtre de temps (Time_window) des events gardés.
     """
-    paris_tz = pytz.timezone("Europe/Paris")
-    rows = []
+    batch = RowBatch("Sportaza")
+    window = as_window(window)
 
     # Valeur par défaut si rien n'est passé
     if Id_sport is None:
-        Id_sport = ["1596","1359","923","924","1380","1405","1406","904","1411","1412","672"]
-
-    # endpoints dynamiques
-    endpoints = [(",".join(Id_sport), "GetOutrightEvents"),
-                 (",".join(Id_sport), "GetEvents")]
-
-    for cat_ids, suffix in endpoints:
-        url = f"https://sb2frontend-altenar2.biahosted.com/api/widget/{suffix}"
-        params = {
-            "culture": "fr-FR",
-            "timezoneOffset": -120,
-            "integration": "sportaza",
-            "deviceType": 1,
-            "numFormat": "en-GB",
-            "countryCode": "LI",
-            "eventCount": 0,
-            "sportId": 0,
-            "catIds": cat_ids
-        }
-
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        odds = {o["id"]: o for o in data.get("odds", [])}
-        champs = {c["id"]: c for c in data.get("champs", [])}
-        events = {e["id"]: e for e in data.get("events", [])}
-
-        for market in data.get("markets", []):
-            event = next(
-                (e for e in events.values() if market["id"] in e.get("marketIds", [])),
-                None
-            )
-            if not event:
-                continue
+        Id_sport = get_plugin("Sportaza").sports
 
-            if len(event.get("competitorIds", [])) != 2 and event.get("sc") != 2:
-                continue
+    # Requêtes GetOutrightEvents / GetEvents découpées par paquets de catIds, en parallèle
+    merged = fetch_altenar(Id_sport, integration="sportaza", deadline=deadline)
 
-            odds_list = [odds[o] for o in market.get("oddIds", []) if o in odds]
-            if len(odds_list) != 2:
-                continue
+    with stage("parse", "Sportaza"):
+        index = index_payload(merged)
 
-            champ = champs.get(event.get("champId"), {})
+        for event, champ, odds_list in iter_h2h_markets(index):
+            # startDate ISO converti en une fois (vectorisé) par RowBatch.to_frame
             start_raw = event.get("startDate")
-
-            cutoff = (
-                datetime.fromisoformat(start_raw.replace("Z", "+00:00"))
-                .astimezone(paris_tz)
-                if start_raw else None
-            )
+            if not window.contains(start_raw):
+                continue
 
             for i in range(2):
-                rows.append({
-                    "Bookmaker": "Sportaza",
-                    "Competition": champ.get("name"),
-                    "Evenement": event.get("name"),
-                    "Competiteur": odds_list[i].get("name"),
-                    "Cote": odds_list[i].get("price"),
-                    "Cutoff": cutoff,
-                })
-
-    df = pd.DataFrame(rows)
-
-    df = df[~df["Competiteur"].isin(["oui", "non"])]
-    df["Extraction"] = datetime.now(paris_tz)
+                # Marchés Oui / Non : pas des face-à-face
+                if odds_list[i].get("name") in ("oui", "non"):
+                    continue
+                batch.append(champ.get("name"), event.get("name"), odds_list[i].get("name"),
+                             odds_list[i].get("price"), start_raw)
 
-    return df[
-        [
-            "Bookmaker",
-            "Competition",
-            "Extraction",
-            "Cutoff",
-            "Evenement",
-            "Competiteur",
-            "Cote"
-        ]
-    ]
\ No newline at end of file
+    return batch.to_frame()
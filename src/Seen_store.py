@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Base des compétitions déjà vues ("Bookmaker | Competition"), en SQLite (WAL).
+
+Remplace data.json : plus de relecture / réécriture complète à chaque run.
+- rétention via un index sur first_seen (DELETE par plage)
+- ajout des nouvelles compétitions par upsert
+- data.json est migré une seule fois à la création de la base
+"""
+import json
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+DB_FILE = BASE_DIR.parent / "data.db"
+LEGACY_JSON = BASE_DIR.parent / "data.json"
+
+# SQLite limite le nombre de paramètres par requête
+_CHUNK = 500
+
+
+class SeenStore:
+    def __init__(self, path=DB_FILE, legacy_json=LEGACY_JSON):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS competitions (
+                key        TEXT PRIMARY KEY,
+                first_seen REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_competitions_first_seen ON competitions(first_seen);
+            CREATE TABLE IF NOT EXISTS meta (
+                name  TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._migrate_json(Path(legacy_json) if legacy_json else None)
+
+    # --- Migration --- #
+    def _migrate_json(self, legacy_json):
+        """Import unique de l'ancien data.json (formats dict et liste)"""
+        if self.conn.execute("SELECT 1 FROM meta WHERE name = 'json_migrated'").fetchone():
+            return
+        migrated = 0
+        if legacy_json and legacy_json.exists():
+            with open(legacy_json, "r", encoding="utf-8") as f:
+                competitions = json.load(f).get("competitions", {})
+            now = time.time()
+            if isinstance(competitions, list):
+                items = [(comp, now) for comp in competitions]
+            else:
+                items = [(comp, datetime.fromisoformat(ts).timestamp()) for comp, ts in competitions.items()]
+            self._upsert(items)
+            migrated = len(items)
+            print(f"📦 Migration de {legacy_json.name} : {migrated} compétition(s) importée(s)")
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('json_migrated', ?)", (str(migrated),))
+
+    # --- Lecture / écriture --- #
+    def _upsert(self, items):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO competitions (key, first_seen) VALUES (?, ?) "
+                "ON CONFLICT(key) DO NOTHING",
+                items,
+            )
+
+    def add(self, keys, seen_at=None):
+        """Enregistre des compétitions ; la date de première vue existante est conservée"""
+        ts = (seen_at or datetime.now()).timestamp()
+        self._upsert([(key, ts) for key in keys])
+
+    def filter_new(self, keys):
+        """Renvoie les clés absentes de la base (requêtes sur la clé primaire)"""
+        keys = list(keys)
+        known = set()
+        for i in range(0, len(keys), _CHUNK):
+            chunk = keys[i:i + _CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            known.update(row[0] for row in self.conn.execute(
+                f"SELECT key FROM competitions WHERE key IN ({placeholders})", chunk))
+        return set(keys) - known
+
+    def purge(self, retention_days):
+        """Supprime les compétitions vues pour la première fois il y a plus de retention_days"""
+        cutoff = (datetime.now() - timedelta(days=retention_days)).timestamp()
+        with self.conn:
+            removed = self.conn.execute("DELETE FROM competitions WHERE first_seen < ?", (cutoff,)).rowcount
+        if removed > 0:
+            print(f"🗑️ Nettoyage : {removed} compétition(s) de plus de {retention_days} jours supprimée(s)")
+        return removed
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM competitions").fetchone()[0]
+
+    def close(self):
+        """Checkpoint du WAL pour que data.db soit autonome (commit git), puis fermeture"""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
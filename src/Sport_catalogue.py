@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Catalogue des sports / catégories de chaque bookmaker, découvert en ligne.
+
+- Pinnacle : /sports (matchupCount par sport)
+- MyStake  : nœud "Sports" de getheader (champs à plus d'un duel)
+- Sportaza : arbre des catégories Altenar (GetSportMenu), sans nombre d'events :
+  eventCount ne compte pas les catégories à outrights seuls (GetOutrightEvents)
+- Betify   : index /0
+
+L'arbre (noms → IDs) est mis en cache disque CATALOGUE_TTL secondes ; les nombres
+de marchés ouverts, qui bougent à chaque ouverture, seulement OPEN_TTL secondes.
+resolve() traduit une liste d'IDs et/ou de noms ("Tennis", "Cyclisme"...) en IDs
+du bookmaker ; avec open_only=True (exports), il écarte aussi les sports sans marché
+ouvert. Les alertes ne filtrent pas : une ouverture ne doit jamais être retardée.
+Sans catalogue (bookmaker non couvert, découverte en échec), les IDs demandés
+sont rendus tels quels. La découverte suit le transport (use_tor) du scraping qui
+la déclenche.
+"""
+import time
+import threading
+
+from Disk_cache import DiskCache
+from Http_client import http_get
+
+CATALOGUE_TTL = 6 * 3600      # durée de vie d'un arbre (noms → IDs) en cache
+OPEN_TTL = 5 * 60             # durée de vie des nombres de marchés ouverts
+FAILURE_RETRY = 5 * 60        # pas de nouvelle découverte avant ce délai après un échec
+
+catalogue_cache = DiskCache("sport_catalogue", ttl=CATALOGUE_TTL)
+open_cache = DiskCache("sport_catalogue_open", ttl=OPEN_TTL)
+_failures = {}
+_lock = threading.Lock()
+
+
+def entry(sport_id, name, sport=None, open_count=None):
+    """Une entrée du catalogue ; open_count = None si le bookmaker ne le donne pas"""
+    return {"id": str(sport_id), "name": name, "sport": sport or name, "open": open_count}
+
+
+# --- Découverte par bookmaker --- #
+# use_tor : transport demandé par l'appelant (None = réglage de l'hôte). Seul Betify
+# a un scraper avec option Tor ; les autres suivent toujours le réglage de leur hôte.
+def discover_pinnacle(use_tor=None):
+    response = http_get("https://guest.api.arcadia.pinnacle.com/0.1/sports", params={"brandId": 0})
+    response.raise_for_status()
+    return [entry(s.get("id"), s.get("name"), open_count=s.get("matchupCount"))
+            for s in response.json()]
+
+
+def discover_mystake(use_tor=None):
+    from Scrap_MyStake import get_header
+
+    sports = get_header().get("EN", {}).get("Sports", {})
+    entries = []
+    for sport_id, node in sports.items():
+        # Face-à-face : champs à plus d'un duel (même règle que le scraper)
+        h2h = sum(1 for reg in node.get("Regions", {}).values()
+                  for champ in reg.get("Champs", {}).values() if champ.get("GameCount", 0) > 1)
+        entries.append(entry(sport_id, node.get("Name"), open_count=h2h))
+    return entries
+
+
+def discover_sportaza(use_tor=None):
+    from Altenar_parser import fetch_categories
+
+    # eventCount ignoré : il peut manquer les outrights que le scraper récupère
+    return [entry(c["id"], c["name"], c["sport"]) for c in fetch_categories("sportaza")]
+
+
+def discover_betify(use_tor=None):
+    from Scrap_Betify import load_index
+
+    data = load_index(use_tor=use_tor) or {}
+    sports = data.get("sports") or {}
+    if isinstance(sports, dict):
+        sports = [dict(node, id=node.get("id", sport_id)) for sport_id, node in sports.items()]
+    return [entry(s.get("id"), s.get("name"), open_count=s.get("count")) for s in sports]
+
+
+DISCOVERERS = {
+    "Pinnacle": discover_pinnacle,
+    "MyStake": discover_mystake,
+    "Sportaza": discover_sportaza,
+    "Betify": discover_betify,
+}
+
+
+# --- API --- #
+def _discover(bookmaker, refresh=False, use_tor=None):
+    """Découverte en ligne ; met à jour l'arbre et les nombres de marchés ouverts"""
+    discoverer = DISCOVERERS.get(bookmaker)
+    if discoverer is None:
+        return None
+    if not refresh:
+        with _lock:
+            if time.monotonic() - _failures.get(bookmaker, float("-inf")) < FAILURE_RETRY:
+                return None
+
+    try:
+        entries = discoverer(use_tor)
+    except Exception as e:
+        print(f"⚠️ Catalogue {bookmaker} indisponible : {e}")
+        entries = []
+    if not entries:
+        with _lock:
+            _failures[bookmaker] = time.monotonic()
+        return None
+
+    catalogue_cache.set(bookmaker, entries)
+    open_cache.set(bookmaker, {e["id"]: e["open"] for e in entries})
+    print(f"🗂️ Catalogue {bookmaker} : {len(entries)} sport(s) / catégorie(s)")
+    return entries
+
+
+def catalogue(bookmaker, refresh=False, use_tor=None):
+    """Entrées {"id", "name", "sport", "open"} du bookmaker ; None si indisponible"""
+    if not refresh:
+        entries = catalogue_cache.get(bookmaker)
+        if entries is not None:
+            return entries
+    return _discover(bookmaker, refresh, use_tor)
+
+
+def open_counts(bookmaker, use_tor=None):
+    """{id: nombre de marchés ouverts (None = inconnu)} de moins de OPEN_TTL ; None si indisponible"""
+    counts = open_cache.get(bookmaker)
+    if counts is None:
+        entries = _discover(bookmaker, use_tor=use_tor)
+        counts = {e["id"]: e["open"] for e in entries} if entries else None
+    return counts
+
+
+def resolve(bookmaker, sports, open_only=False, use_tor=None):
+    """
+    IDs du bookmaker pour `sports` (IDs ou noms de sport / catégorie, sans casse).
+    open_only : écarte les entrées dont le nombre de marchés ouverts (< OPEN_TTL) est 0.
+    use_tor   : transport d'une éventuelle découverte (None = réglage de l'hôte).
+    """
+    requested = [str(s) for s in sports]
+    entries = catalogue(bookmaker, use_tor=use_tor)
+    if not entries:
+        return list(dict.fromkeys(requested))
+
+    by_id = {e["id"]: e for e in entries}
+    ids = []
+    for item in requested:
+        if item in by_id:
+            ids.append(item)
+            continue
+        key = item.strip().lower()
+        matches = [e["id"] for e in entries
+                   if key in (str(e["name"]).strip().lower(), str(e["sport"]).strip().lower())]
+        # ID inconnu du catalogue : gardé tel quel
+        ids.extend(matches or [item])
+
+    ids = list(dict.fromkeys(ids))
+    counts = open_counts(bookmaker, use_tor) if open_only else None
+    if counts:
+        closed = [i for i in ids if counts.get(i) == 0]
+        if closed:
+            print(f"🗂️ {bookmaker} : {len(closed)} sport(s) sans marché ouvert ignoré(s) ({', '.join(closed)})")
+            ids = [i for i in ids if i not in closed]
+    return ids
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+File d'envoi Telegram asynchrone.
+
+- send() ne bloque pas : le message est confié à un thread d'envoi
+- les messages reçus dans une même fenêtre (COALESCE_WINDOW) sont regroupés
+  en un seul envoi (dans la limite de 4096 caractères de Telegram)
+- débit limité (MIN_INTERVAL entre deux envois), respect du retry_after des 429
+- les messages sont d'abord écrits dans la table outbox (SQLite) et n'en sont
+  supprimés qu'une fois délivrés : ce qui n'a pas pu partir est renvoyé au run suivant
+"""
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from Http_client import http_post
+
+BASE_DIR = Path(__file__).resolve().parent
+DB_FILE = BASE_DIR.parent / "data.db"
+
+COALESCE_WINDOW = 3.0     # secondes d'attente pour regrouper les messages
+MIN_INTERVAL = 3.0        # secondes entre deux envois (≈ 20 messages / minute)
+MAX_LENGTH = 4096         # taille max d'un message Telegram
+MAX_ATTEMPTS = 5          # au-delà, un message en erreur permanente est abandonné
+SEPARATOR = "\n\n"
+
+
+class TelegramQueue:
+    def __init__(self, token, chat_id, path=DB_FILE):
+        self.token = token
+        self.chat_id = chat_id
+        self.path = Path(path)
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._give_up_at = None
+        self._next_send = 0.0
+
+    # --- API --- #
+    def start(self):
+        """Démarre le thread d'envoi (renvoie aussi les messages restés dans l'outbox)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="telegram-queue", daemon=True)
+            self._thread.start()
+        return self
+
+    def send(self, text):
+        """Ajoute un message à la file (non bloquant)"""
+        self._queue.put((text, time.time()))
+        self.start()
+
+    def close(self, timeout=60):
+        """
+        Laisse jusqu'à `timeout` secondes pour vider la file, puis arrête le thread.
+        Les messages non délivrés restent dans l'outbox.
+        """
+        if self._thread is None:
+            return
+        self._give_up_at = time.monotonic() + timeout
+        self._stop.set()
+        self._thread.join(timeout + 10)
+        self._thread = None
+
+    # --- Base --- #
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id       INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id  TEXT NOT NULL,
+                text     TEXT NOT NULL,
+                created  REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        return conn
+
+    def _store(self, conn, item):
+        text, created = item
+        with conn:
+            conn.execute("INSERT INTO outbox (chat_id, text, created) VALUES (?, ?, ?)",
+                         (str(self.chat_id), text, created))
+
+    def _drain(self, conn, wait=0.0):
+        """Écrit en base les messages reçus ; attend jusqu'à `wait` secondes le premier"""
+        received = 0
+        end = time.monotonic() + wait
+        while True:
+            try:
+                item = self._queue.get(timeout=max(end - time.monotonic(), 0)) if wait else self._queue.get_nowait()
+            except queue.Empty:
+                return received
+            self._store(conn, item)
+            received += 1
+            wait = 0.0
+
+    def _pending(self, conn):
+        return conn.execute("SELECT id, text, attempts FROM outbox WHERE chat_id = ? ORDER BY id",
+                            (str(self.chat_id),)).fetchall()
+
+    # --- Envoi --- #
+    def _batch(self, pending):
+        """Regroupe les plus anciens messages en un texte ≤ MAX_LENGTH"""
+        ids, parts, length = [], [], 0
+        for msg_id, text, _ in pending:
+            text = text[:MAX_LENGTH]
+            extra = len(text) + (len(SEPARATOR) if parts else 0)
+            if parts and length + extra > MAX_LENGTH:
+                break
+            ids.append(msg_id)
+            parts.append(text)
+            length += extra
+        return ids, SEPARATOR.join(parts)
+
+    def _post(self, text):
+        """Renvoie (statut, retry_after) ; statut : "ok", "retry" ou "error" (permanent)"""
+        url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+        try:
+            # Pas de retry dans Http_client : les 429 sont gérés ici avec le retry_after de Telegram
+            response = http_post(url, data={"chat_id": self.chat_id, "text": text}, timeout=(5, 15), retries=0)
+        except requests.RequestException as e:
+            print(f"⚠️ Erreur Telegram : {e}")
+            return "retry", None
+
+        if response.status_code == 200:
+            print(f"✅ Message Telegram envoyé : {response.status_code}")
+            return "ok", None
+        if response.status_code == 429:
+            try:
+                retry_after = response.json().get("parameters", {}).get("retry_after")
+            except ValueError:
+                retry_after = None
+            print(f"⏳ Telegram : limite atteinte, nouvel essai dans {retry_after or MIN_INTERVAL}s")
+            return "retry", retry_after
+        print(f"⚠️ Erreur Telegram : {response.status_code} {response.text[:200]}")
+        return ("retry" if response.status_code >= 500 else "error"), None
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                self._drain(conn)
+                pending = self._pending(conn)
+
+                if self._stop.is_set() and (not pending or time.monotonic() >= self._give_up_at):
+                    if pending:
+                        print(f"📮 {len(pending)} message(s) Telegram gardé(s) pour le prochain run")
+                    break
+
+                if not pending:
+                    # Attente d'un message, puis fenêtre de regroupement
+                    if self._drain(conn, wait=0.5) and not self._stop.is_set():
+                        end = time.monotonic() + COALESCE_WINDOW
+                        while time.monotonic() < end and not self._stop.is_set():
+                            self._drain(conn, wait=min(0.5, max(end - time.monotonic(), 0)))
+                    continue
+
+                # Débit : attendre le prochain créneau autorisé
+                delay = self._next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(min(delay, 0.5))
+                    continue
+
+                ids, text = self._batch(pending)
+                status, retry_after = self._post(text)
+                self._next_send = time.monotonic() + max(MIN_INTERVAL, retry_after or 0)
+                placeholders = ",".join("?" * len(ids))
+                with conn:
+                    if status == "ok":
+                        conn.execute(f"DELETE FROM outbox WHERE id IN ({placeholders})", ids)
+                    else:
+                        conn.execute(f"UPDATE outbox SET attempts = attempts + 1 WHERE id IN ({placeholders})", ids)
+                        if status == "error":
+                            conn.execute(f"DELETE FROM outbox WHERE id IN ({placeholders}) AND attempts >= ?",
+                                         [*ids, MAX_ATTEMPTS])
+        finally:
+            conn.close()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Fenêtre de temps commune aux scrapers : events pas encore commencés, et
+(optionnel) débutant dans les N prochaines heures.
+
+Chaque scraper l'applique le plus tôt possible : avant toute requête de suivi
+par event (descriptions v3 Betify...) et avant la construction des lignes.
+
+    window = TimeWindow(hours=48)
+    window.contains("2026-01-30T18:00:00Z")   # ISO, epoch (s / ms), datetime
+
+Défaut : SCRAP_WINDOW_HOURS (vide = pas de limite, seuls les events commencés sont écartés).
+"""
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+
+DEFAULT_HOURS = float(os.environ["SCRAP_WINDOW_HOURS"]) if os.environ.get("SCRAP_WINDOW_HOURS") else None
+
+
+def to_timestamp(value):
+    """Instant en secondes epoch ; None si inconnu ou illisible"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        if value != value:  # NaN
+            return None
+        # Certaines API donnent des millisecondes
+        return value / 1000 if value > 1e11 else float(value)
+    if isinstance(value, datetime):
+        return None if pd.isna(value) else value.timestamp()
+    return _parse_iso(str(value))
+
+
+@lru_cache(maxsize=4096)
+def _parse_iso(text):
+    """Chaîne ISO 8601 → epoch (sans fuseau : UTC) ; les mêmes dates reviennent sur chaque event"""
+    try:
+        ts = pd.Timestamp(text.replace("Z", "+00:00"))
+    except (ValueError, TypeError):
+        return None
+    if pd.isna(ts):
+        return None
+    return ts.timestamp() if ts.tzinfo else ts.tz_localize("UTC").timestamp()
+
+
+class TimeWindow:
+    """Events dont le début est dans ]start, end] (end = None : pas de limite)"""
+    __slots__ = ("hours", "start", "end")
+
+    def __init__(self, hours=None, start=None):
+        self.hours = hours
+        self.start = time.time() if start is None else start
+        self.end = None if hours is None else self.start + hours * 3600
+
+    def contains(self, value):
+        """Date inconnue : l'event est gardé"""
+        ts = to_timestamp(value)
+        if ts is None:
+            return True
+        return ts > self.start and (self.end is None or ts <= self.end)
+
+    def __repr__(self):
+        return f"TimeWindow(hours={self.hours})"
+
+
+def as_window(window=None):
+    """None → fenêtre par défaut, nombre → heures, TimeWindow → inchangée"""
+    if isinstance(window, TimeWindow):
+        return window
+    return TimeWindow(DEFAULT_HOURS if window is None else window)
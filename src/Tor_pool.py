@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de circuits Tor pour les requêtes use_tor=True.
+
+- plusieurs ports SOCKS (SCRAP_TOR_ENDPOINTS="127.0.0.1:9050,127.0.0.1:9052")
+- plusieurs circuits isolés par port : Tor (IsolateSOCKSAuth, actif par défaut)
+  ouvre un circuit distinct pour chaque couple identifiant / mot de passe SOCKS
+- chaque requête part sur le circuit le moins chargé (requêtes en cours, puis latence)
+- un circuit lent ou bloqué (erreurs réseau, 403 / 429 / 503) est évincé :
+  il reçoit de nouveaux identifiants, donc un nouveau circuit Tor
+
+Pour les tests, SCRAP_TOR_ENDPOINTS peut pointer vers un serveur SOCKS local
+(SCRAP_TOR_ISOLATE=0 si celui-ci n'accepte pas d'authentification).
+"""
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ENDPOINTS = [e.strip() for e in os.environ.get("SCRAP_TOR_ENDPOINTS", "127.0.0.1:9050").split(",") if e.strip()]
+CIRCUITS_PER_ENDPOINT = int(os.environ.get("SCRAP_TOR_CIRCUITS", "4"))
+ISOLATE = os.environ.get("SCRAP_TOR_ISOLATE", "1") != "0"
+
+MAX_FAILURES = 3          # échecs consécutifs avant éviction
+SLOW_LATENCY = 15.0       # latence moyenne (s) au-delà de laquelle le circuit est évincé
+EWMA_ALPHA = 0.3          # poids de la dernière mesure dans la latence moyenne
+BLOCKED_STATUS = {403, 429, 503}
+CHECK_URL = "https://check.torproject.org/api/ip"
+CHECK_TIMEOUT = (10, 15)
+
+# Appelés avec l'ancienne URL de proxy quand un circuit est renouvelé
+# (Http_client y ferme les pools de connexions SOCKS de cette URL)
+_renew_listeners = []
+
+
+def on_renew(callback):
+    """Enregistre callback(ancienne_url_proxy), appelé à chaque éviction de circuit"""
+    _renew_listeners.append(callback)
+
+
+class Circuit:
+    """Un circuit = un port SOCKS + des identifiants d'isolation"""
+    __slots__ = ("endpoint", "proxies", "in_flight", "latency", "failures", "requests", "evictions")
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.in_flight = 0
+        self.evictions = 0
+        self.renew()
+
+    def renew(self):
+        """Nouveaux identifiants → Tor construit un nouveau circuit ; statistiques remises à zéro"""
+        auth = f"{uuid.uuid4().hex[:12]}:{uuid.uuid4().hex[:12]}@" if ISOLATE else ""
+        url = f"socks5h://{auth}{self.endpoint}"
+        self.proxies = {"http": url, "https": url}
+        self.latency = None
+        self.failures = 0
+        self.requests = 0
+
+    def score(self):
+        return (self.in_flight, self.latency if self.latency is not None else 0.0)
+
+
+class TorPool:
+    def __init__(self, endpoints=None, circuits_per_endpoint=None):
+        endpoints = endpoints or ENDPOINTS
+        per_endpoint = circuits_per_endpoint or CIRCUITS_PER_ENDPOINT
+        self.circuits = [Circuit(endpoint) for endpoint in endpoints for _ in range(per_endpoint)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.circuits)
+
+    def acquire(self):
+        """Circuit le moins chargé (à rendre avec release)"""
+        with self._lock:
+            circuit = min(self.circuits, key=Circuit.score)
+            circuit.in_flight += 1
+            return circuit
+
+    def release(self, circuit, latency=None, ok=True, status=None):
+        """
+        Rend un circuit après une tentative.
+        ok=False (erreur réseau) ou status bloquant : compte comme un échec.
+        """
+        with self._lock:
+            circuit.in_flight = max(circuit.in_flight - 1, 0)
+            circuit.requests += 1
+            if latency is not None:
+                circuit.latency = latency if circuit.latency is None else \
+                    EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * circuit.latency
+
+            if not ok or status in BLOCKED_STATUS:
+                circuit.failures += 1
+            else:
+                circuit.failures = 0
+
+            slow = circuit.latency is not None and circuit.latency > SLOW_LATENCY
+            if circuit.failures >= MAX_FAILURES or slow:
+                self._evict(circuit, "lent" if slow else "bloqué")
+
+    def _evict(self, circuit, reason):
+        circuit.evictions += 1
+        print(f"🧅 Circuit Tor {circuit.endpoint} évincé ({reason}), nouveau circuit demandé")
+        old_url = circuit.proxies["https"]
+        circuit.renew()
+        for callback in _renew_listeners:
+            callback(old_url)
+
+    def health_check(self, url=CHECK_URL, timeout=CHECK_TIMEOUT):
+        """Teste tous les circuits en parallèle ; évince ceux qui échouent. Renvoie le nombre de circuits sains."""
+        def check(circuit):
+            start = time.perf_counter()
+            try:
+                response = requests.get(url, proxies=circuit.proxies, timeout=timeout)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            return circuit, ok, time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=len(self.circuits)) as executor:
+            results = list(executor.map(check, self.circuits))
+
+        healthy = 0
+        with self._lock:
+            for circuit, ok, latency in results:
+                if ok and latency <= SLOW_LATENCY:
+                    healthy += 1
+                    circuit.latency = latency
+                    circuit.failures = 0
+                else:
+                    self._evict(circuit, "health check")
+        print(f"🧅 Tor : {healthy}/{len(self.circuits)} circuit(s) sain(s)")
+        return healthy
+
+    def stats(self):
+        with self._lock:
+            return [{"endpoint": c.endpoint, "in_flight": c.in_flight, "latency": c.latency,
+                     "failures": c.failures, "requests": c.requests, "evictions": c.evictions}
+                    for c in self.circuits]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool partagé, créé au premier usage depuis la configuration (variables SCRAP_TOR_*)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = TorPool()
+    return _pool
+
+
+def set_pool(pool):
+    """Remplace le pool partagé (tests : serveur SOCKS local)"""
+    global _pool
+    with _pool_lock:
+        _pool = pool